@@ -6,12 +6,7 @@ A comprehensive system for customer segmentation using unsupervised ML technique
 __version__ = '1.0.0'
 __author__ = 'Your Name'
 
-from . import data_loader
-from . import preprocessing
-from . import clustering
-from . import evaluation
-from . import profiling
-from . import visualization
+import importlib
 
 __all__ = [
     'data_loader',
@@ -21,3 +16,15 @@ __all__ = [
     'profiling',
     'visualization'
 ]
+
+
+def __getattr__(name):
+    """
+    Import submodules on first access.
+    
+    Keeps e.g. ``import src.deployment`` in an API worker from loading
+    matplotlib and seaborn through the plotting modules.
+    """
+    if name in __all__:
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -5,12 +5,345 @@ Implements K-Means, DBSCAN, Hierarchical Clustering, and GMM.
 
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans, DBSCAN, AgglomerativeClustering
+from sklearn.cluster import (
+    KMeans, MiniBatchKMeans, DBSCAN, AgglomerativeClustering, kmeans_plusplus
+)
 from sklearn.mixture import GaussianMixture
 from sklearn.neighbors import NearestNeighbors
-from scipy.cluster.hierarchy import dendrogram, linkage
+from sklearn.utils import check_random_state
+from scipy.cluster.hierarchy import dendrogram, linkage, fcluster
+from scipy.sparse import csr_matrix
 import matplotlib.pyplot as plt
+import contextlib
 import joblib
+from joblib import Parallel, delayed, effective_n_jobs
+from threadpoolctl import threadpool_limits
+import numba
+from numba import njit, prange
+
+try:
+    import cupy
+    import cuml
+    _HAS_CUML = True
+except ImportError:
+    _HAS_CUML = False
+
+
+@njit(parallel=True, fastmath=True, boundscheck=False, cache=True)
+def _assign_numba(X, centers, labels):
+    """
+    Assign each point to its nearest center; returns the inertia.
+    
+    The running argmin is updated without a data-dependent branch so the
+    compiler can emit compare/blend instructions instead of a jump per
+    (point, center) pair.
+    """
+    n_samples, n_features = X.shape
+    n_clusters = centers.shape[0]
+    inertia = 0.0
+    
+    for i in prange(n_samples):
+        # Seeded from center 0 rather than inf: fastmath lets the compiler
+        # assume no operand is infinite
+        best_dist = np.float32(0.0)
+        for f in range(n_features):
+            diff = X[i, f] - centers[0, f]
+            best_dist += diff * diff
+        best_idx = 0
+        for j in range(1, n_clusters):
+            dist = np.float32(0.0)
+            for f in range(n_features):
+                diff = X[i, f] - centers[j, f]
+                dist += diff * diff
+            is_better = dist < best_dist
+            best_dist = min(best_dist, dist)
+            best_idx = is_better * j + (1 - is_better) * best_idx
+        labels[i] = best_idx
+        inertia += best_dist
+    
+    return inertia
+
+
+@njit(parallel=True, fastmath=True, boundscheck=False, cache=True)
+def _lloyd_numba(X, centers, max_iter, tol, n_chunks):
+    """
+    Run Lloyd iterations on contiguous float32 data.
+    
+    The assignment step runs one point per parallel iteration. The update
+    step accumulates per-chunk partial sums (one chunk per thread) which
+    are then reduced per cluster, so no two threads write the same buffer.
+    
+    Returns:
+    --------
+    tuple
+        (labels, centers, inertia, n_iter)
+    """
+    n_samples, n_features = X.shape
+    n_clusters = centers.shape[0]
+    centers = centers.copy()
+    labels = np.zeros(n_samples, dtype=np.int64)
+    chunk_size = (n_samples + n_chunks - 1) // n_chunks
+    n_iter = 0
+    
+    for it in range(max_iter):
+        n_iter = it + 1
+        _assign_numba(X, centers, labels)
+        
+        local_sums = np.zeros((n_chunks, n_clusters, n_features))
+        local_counts = np.zeros((n_chunks, n_clusters), dtype=np.int64)
+        for c in prange(n_chunks):
+            stop = min((c + 1) * chunk_size, n_samples)
+            for i in range(c * chunk_size, stop):
+                j = labels[i]
+                local_counts[c, j] += 1
+                for f in range(n_features):
+                    local_sums[c, j, f] += X[i, f]
+        
+        shift = 0.0
+        for j in prange(n_clusters):
+            count = 0
+            for c in range(n_chunks):
+                count += local_counts[c, j]
+            if count == 0:
+                # Empty cluster: keep its previous center
+                continue
+            for f in range(n_features):
+                total = 0.0
+                for c in range(n_chunks):
+                    total += local_sums[c, j, f]
+                new_value = total / count
+                diff = new_value - centers[j, f]
+                shift += diff * diff
+                centers[j, f] = new_value
+        
+        if shift <= tol:
+            break
+    
+    # Final assignment so labels and inertia match the returned centers
+    inertia = _assign_numba(X, centers, labels)
+    
+    return labels, centers, inertia, n_iter
+
+
+# Silhouette is O(n²); sweeps score it on a random subset of this many points
+_SILHOUETTE_SAMPLE_SIZE = 5000
+
+# Above this many samples the k sweep uses MiniBatchKMeans; the final fit()
+# always runs full Lloyd
+_MINIBATCH_MIN_SAMPLES = 5000
+
+# Per-point work (n_features * n_clusters) above which one BLAS-3 call beats
+# the fused Numba loop for the assignment step
+_GEMM_MIN_WORK = 512
+
+
+def _assign_expanded(X, centers, x_sq):
+    """
+    Assign points to their nearest center using ||x||² + ||c||² - 2·x·c.
+    
+    Only the X @ C.T product depends on the centers, so x_sq is computed
+    once by the caller and reused across iterations and k values.
+    
+    Returns:
+    --------
+    tuple
+        (labels, squared distance of each point to its center)
+    """
+    c_sq = np.einsum('ij,ij->i', centers, centers)
+    dist = X.dot(centers.T)
+    dist *= -2
+    dist += x_sq[:, None]
+    dist += c_sq
+    labels = np.argmin(dist, axis=1)
+    min_dist = np.take_along_axis(dist, labels[:, None], axis=1).ravel()
+    
+    return labels, np.maximum(min_dist, 0)
+
+
+def _lloyd_expanded(X, centers, x_sq, max_iter, tol):
+    """Lloyd iterations with GEMM assignment; same outputs as _lloyd_numba."""
+    n_samples = X.shape[0]
+    n_clusters = centers.shape[0]
+    rows = np.arange(n_samples)
+    ones = np.ones(n_samples)
+    n_iter = 0
+    
+    for it in range(max_iter):
+        n_iter = it + 1
+        labels, _ = _assign_expanded(X, centers, x_sq)
+        
+        # Sparse membership matrix turns the per-cluster sums into one product
+        membership = csr_matrix((ones, (labels, rows)), shape=(n_clusters, n_samples))
+        counts = np.bincount(labels, minlength=n_clusters)
+        nonempty = counts > 0
+        new_centers = centers.copy()
+        new_centers[nonempty] = (membership @ X)[nonempty] / counts[nonempty, None]
+        
+        shift = np.sum((new_centers - centers) ** 2)
+        centers = new_centers
+        if shift <= tol:
+            break
+    
+    labels, min_dist = _assign_expanded(X, centers, x_sq)
+    
+    return labels, centers, float(min_dist.sum()), n_iter
+
+
+def _fit_kmeans(X, x_sq, n_clusters, init, n_init, max_iter, tol, random_state):
+    """
+    Best-of-n_init K-Means on contiguous float32 data.
+    
+    Returns:
+    --------
+    tuple
+        (labels, centers, inertia, n_iter) of the run with the lowest inertia
+    """
+    if isinstance(init, str) and init not in ('k-means++', 'random'):
+        raise ValueError(f"init must be 'k-means++', 'random', a callable or an array of centers, "
+                         f"got {init!r}")
+    if not isinstance(init, str) and not callable(init):
+        n_init = 1
+    use_gemm = X.shape[1] * n_clusters >= _GEMM_MIN_WORK
+    n_chunks = max(1, min(numba.get_num_threads(), len(X)))
+    
+    best = None
+    for _ in range(n_init):
+        if isinstance(init, str) and init == 'k-means++':
+            centers, _ = kmeans_plusplus(X, n_clusters, x_squared_norms=x_sq,
+                                         random_state=random_state)
+        elif isinstance(init, str) and init == 'random':
+            seeds = random_state.choice(len(X), n_clusters, replace=False)
+            centers = X[seeds]
+        elif callable(init):
+            # Same signature sklearn's KMeans uses for callable init
+            centers = init(X, n_clusters, random_state)
+        else:
+            centers = init
+        centers = np.ascontiguousarray(centers, dtype=np.float32)
+        
+        if use_gemm:
+            result = _lloyd_expanded(X, centers, x_sq, max_iter, tol)
+        else:
+            result = _lloyd_numba(X, centers, max_iter, tol, n_chunks)
+        if best is None or result[2] < best[2]:
+            best = result
+    
+    return best
+
+
+def _kmeanspp_from_existing(centers, X, x_sq, random_state):
+    """
+    Extend a set of centers by one point using greedy k-means++ sampling.
+    
+    Several candidates are drawn with probability proportional to D² and
+    the one that lowers the total potential most is kept. Distances come
+    from the same expanded-L2 product as the assignment step, so the
+    precomputed x_sq is reused.
+    """
+    _, min_dist = _assign_expanded(X, centers, x_sq)
+    n_trials = 2 + int(np.log(len(centers) + 1))
+    cumulative = np.cumsum(min_dist, dtype=np.float64)
+    targets = random_state.uniform(size=n_trials) * cumulative[-1]
+    candidates = np.minimum(np.searchsorted(cumulative, targets), len(X) - 1)
+    
+    # Distance of every point to each candidate, one GEMM for all trials
+    cand = X[candidates]
+    cand_dist = x_sq[:, None] + x_sq[candidates] - 2 * X.dot(cand.T)
+    potentials = np.minimum(min_dist[:, None], cand_dist).sum(axis=0)
+    best = candidates[np.argmin(potentials)]
+    
+    return np.vstack([centers, X[best]])
+
+
+def _sampled_silhouette(X, labels):
+    """Silhouette score on at most _SILHOUETTE_SAMPLE_SIZE random points."""
+    from sklearn.metrics import silhouette_score
+    
+    sample_size = _SILHOUETTE_SAMPLE_SIZE if len(X) > _SILHOUETTE_SAMPLE_SIZE else None
+    return silhouette_score(X, labels, sample_size=sample_size, random_state=42)
+
+
+def _score_labels(X, labels, k):
+    """Silhouette, Calinski-Harabasz and Davies-Bouldin scores, or None for k < 2."""
+    from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score
+    
+    if k < 2:
+        return None
+    
+    return (_sampled_silhouette(X, labels),
+            calinski_harabasz_score(X, labels),
+            davies_bouldin_score(X, labels))
+
+
+def _fit_sweep_k(X, x_sq, k, tol, init=None, random_state=None):
+    """
+    Fit one k of the elbow sweep.
+    
+    Large inputs use MiniBatchKMeans, whose inertia curve is close enough
+    for choosing k. init holds warm-start centers, or None for fresh
+    k-means++ restarts.
+    
+    Returns:
+    --------
+    tuple
+        (labels, centers, inertia)
+    """
+    if len(X) > _MINIBATCH_MIN_SAMPLES:
+        model = MiniBatchKMeans(
+            n_clusters=k,
+            init='k-means++' if init is None else init,
+            n_init=3 if init is None else 1,
+            batch_size=1024,
+            max_iter=100,
+            random_state=42
+        )
+        labels = model.fit_predict(X)
+        return labels, model.cluster_centers_, model.inertia_
+    
+    if init is None:
+        labels, centers, inertia, _ = _fit_kmeans(X, x_sq, k, 'k-means++', 10, 300, tol,
+                                                  check_random_state(42))
+    else:
+        labels, centers, inertia, _ = _fit_kmeans(X, x_sq, k, init, 1, 300, tol,
+                                                  random_state)
+    
+    return labels, centers, inertia
+
+
+def _sweep_blas_limits(n_jobs):
+    """
+    One BLAS thread while several sweep workers run, to avoid
+    oversubscribing the cores. The limit is process-wide, so it is set once
+    around the parallel section rather than inside each worker thread.
+    """
+    if effective_n_jobs(n_jobs) > 1:
+        return threadpool_limits(1)
+    return contextlib.nullcontext()
+
+
+def _count_clusters(labels):
+    """Number of clusters and noise points in a DBSCAN labeling."""
+    unique = np.unique(labels)
+    # unique is sorted, so the noise label -1 can only be first
+    n_clusters = unique.size - (1 if unique.size and unique[0] == -1 else 0)
+    n_noise = int((labels == -1).sum())
+    
+    return n_clusters, n_noise
+
+
+def _restrict_radius_graph(graph, eps):
+    """
+    Keep only the edges of a radius-neighbors distance graph within eps.
+    
+    Explicit zero entries (each point's self-edge, duplicate points) are
+    preserved, which DBSCAN's precomputed mode relies on for min_samples.
+    """
+    mask = graph.data <= eps
+    # Every row holds at least its self-edge, so reduceat sees no empty rows
+    counts = np.add.reduceat(mask.astype(np.int64), graph.indptr[:-1])
+    indptr = np.concatenate(([0], np.cumsum(counts)))
+    
+    return csr_matrix((graph.data[mask], graph.indices[mask], indptr), shape=graph.shape)
 
 
 class ClusteringModel:
@@ -33,6 +366,15 @@ class ClusteringModel:
         self.n_clusters = None
         self.params = kwargs
     
+    def _prepare(self, X):
+        """
+        Convert X to a C-contiguous float32 array.
+        
+        Inputs that are already contiguous float32 are used as-is; pass
+        such an array to skip the copy on repeated fit/predict/find_* calls.
+        """
+        return np.ascontiguousarray(X, dtype=np.float32)
+    
     def fit(self, X):
         """Fit the clustering model."""
         raise NotImplementedError
@@ -56,7 +398,7 @@ class KMeansClusterer(ClusteringModel):
     """K-Means clustering implementation."""
     
     def __init__(self, n_clusters=5, init='k-means++', n_init=10, 
-                 max_iter=300, random_state=42):
+                 max_iter=300, random_state=42, use_gpu='auto'):
         """
         Initialize K-Means clusterer.
         
@@ -72,9 +414,14 @@ class KMeansClusterer(ClusteringModel):
             Maximum iterations
         random_state : int
             Random seed
+        use_gpu : bool or 'auto'
+            Fit with cuML on the GPU; 'auto' uses it when cuML is installed
+            and the data fits in free device memory
         """
         super().__init__(model_type='kmeans')
         self.n_clusters = n_clusters
+        self.random_state = random_state
+        self.use_gpu = use_gpu
         self.model = KMeans(
             n_clusters=n_clusters,
             init=init,
@@ -99,15 +446,87 @@ class KMeansClusterer(ClusteringModel):
         array
             Cluster labels
         """
-        self.labels = self.model.fit_predict(X)
-        self.cluster_centers = self.model.cluster_centers_
-        self.inertia = self.model.inertia_
+        X = self._prepare(X)
+        params = self.model.get_params()
+        
+        if self._gpu_available(X):
+            labels, centers, inertia, n_iter = self._fit_gpu(X, params['max_iter'])
+        else:
+            x_sq = np.einsum('ij,ij->i', X, X)
+            # Same convergence criterion as sklearn: tol relative to data variance
+            tol = params['tol'] * np.mean(np.var(X, axis=0))
+            
+            labels, centers, inertia, n_iter = _fit_kmeans(
+                X, x_sq, self.n_clusters, params['init'], params['n_init'],
+                params['max_iter'], tol, check_random_state(self.random_state)
+            )
+        self.labels = labels
+        self.cluster_centers = centers.astype(np.float64)
+        self.inertia = float(inertia)
+        self._sync_model(n_iter)
         
         print(f"K-Means fitted with {self.n_clusters} clusters")
         print(f"Inertia: {self.inertia:.2f}")
         
         return self.labels
     
+    def _gpu_available(self, X):
+        """Whether fit() should dispatch to cuML for this data."""
+        if not self.use_gpu:
+            return False
+        if not _HAS_CUML:
+            if self.use_gpu != 'auto':
+                print("Warning: cuML not available, fitting K-Means on CPU.")
+            return False
+        
+        try:
+            free_bytes, _ = cupy.cuda.runtime.memGetInfo()
+        except cupy.cuda.runtime.CUDARuntimeError:
+            return False
+        
+        return X.nbytes < 0.8 * free_bytes
+    
+    def _fit_gpu(self, X, max_iter):
+        """
+        Fit K-Means on the GPU with cuML and copy the results back to host.
+        
+        Returns:
+        --------
+        tuple
+            (labels, centers, inertia, n_iter)
+        """
+        X_gpu = cupy.asarray(X)
+        model = cuml.KMeans(
+            n_clusters=self.n_clusters,
+            init='k-means||',
+            n_init=1,
+            max_iter=max_iter,
+            random_state=self.random_state
+        ).fit(X_gpu)
+        
+        labels = cupy.asnumpy(model.labels_).astype(np.int64)
+        centers = cupy.asnumpy(model.cluster_centers_)
+        
+        return labels, centers, float(model.inertia_), int(model.n_iter_)
+    
+    def _sync_model(self, n_iter):
+        """
+        Load the fitted centers into the sklearn estimator.
+        
+        Fitting a single iteration on the centers themselves leaves them
+        unchanged, which gives a properly fitted KMeans for predict() and
+        save_model() without rerunning Lloyd on the full data.
+        """
+        params = self.model.get_params()
+        self.model.set_params(init=self.cluster_centers, n_init=1, max_iter=1)
+        self.model.fit(self.cluster_centers)
+        self.model.set_params(init=params['init'], n_init=params['n_init'],
+                              max_iter=params['max_iter'])
+        
+        self.model.labels_ = self.labels
+        self.model.inertia_ = self.inertia
+        self.model.n_iter_ = n_iter
+    
     def predict(self, X):
         """
         Predict cluster labels for new data.
@@ -122,9 +541,16 @@ class KMeansClusterer(ClusteringModel):
         array
             Cluster labels
         """
-        return self.model.predict(X)
+        X = self._prepare(X)
+        # Centers come from the estimator so models restored with
+        # load_model() predict the same way as freshly fitted ones
+        centers = np.asarray(self.model.cluster_centers_, dtype=np.float32)
+        labels, _ = _assign_expanded(X, centers, np.einsum('ij,ij->i', X, X))
+        
+        return labels
     
-    def find_optimal_clusters(self, X, k_range=range(2, 11), method='all'):
+    def find_optimal_clusters(self, X, k_range=range(2, 11), method='all', warm_start=False,
+                              n_jobs=-1):
         """
         Find optimal number of clusters using multiple methods.
         
@@ -136,16 +562,26 @@ class KMeansClusterer(ClusteringModel):
             Range of k values to test
         method : str
             'elbow', 'silhouette', 'all'
+        warm_start : bool
+            Seed each k from the previous k's centroids plus one k-means++
+            point instead of running n_init=10 fresh initializations.
+            Faster, but the curves can differ from independent fits and
+            shift the chosen k, so it is off by default
+        n_jobs : int
+            Number of joblib worker threads scoring the k values (-1 = all cores)
             
         Returns:
         --------
         dict
             Metrics for each k value
         """
-        from sklearn.metrics import silhouette_score, calinski_harabasz_score, davies_bouldin_score
-        
         print(f"Finding optimal clusters for k in {list(k_range)}...")
         
+        # Squared norms and tolerance are shared by every k in the sweep
+        X = self._prepare(X)
+        x_sq = np.einsum('ij,ij->i', X, X)
+        tol = 1e-4 * np.mean(np.var(X, axis=0))
+        
         results = {
             'k_values': [],
             'inertias': [],
@@ -154,23 +590,40 @@ class KMeansClusterer(ClusteringModel):
             'davies_bouldin_scores': []
         }
         
+        # Fits run one after another: the numba kernels and BLAS already use
+        # every core, and numba's parallel kernels must not be entered from
+        # several threads at once. Only the metric computation (silhouette
+        # dominates) is spread over joblib worker threads
+        random_state = check_random_state(42)
+        prev_k, prev_centers = None, None
+        fits = []
+        
         for k in k_range:
-            # Fit model
-            kmeans = KMeans(n_clusters=k, init='k-means++', n_init=10, 
-                             max_iter=300, random_state=42)
-            labels = kmeans.fit_predict(X)
-            
-            # Calculate metrics
+            init = None
+            if warm_start and prev_k == k - 1:
+                # Seed k from k-1's centroids plus one k-means++ point
+                init = _kmeanspp_from_existing(prev_centers, X, x_sq, random_state)
+            labels, centers, inertia = _fit_sweep_k(X, x_sq, k, tol, init, random_state)
+            prev_k, prev_centers = k, centers
+            fits.append((k, labels, inertia))
+        
+        with _sweep_blas_limits(n_jobs):
+            scores = Parallel(n_jobs=n_jobs, prefer='threads')(
+                delayed(_score_labels)(X, labels, k) for k, labels, _ in fits
+            )
+        sweep = [(k, inertia, score) for (k, _, inertia), score in zip(fits, scores)]
+        
+        for k, inertia, score in sweep:
             results['k_values'].append(k)
-            results['inertias'].append(kmeans.inertia_)
+            results['inertias'].append(inertia)
             
-            if k > 1:  # Silhouette requires at least 2 clusters
-                results['silhouette_scores'].append(silhouette_score(X, labels))
-                results['calinski_harabasz_scores'].append(calinski_harabasz_score(X, labels))
-                results['davies_bouldin_scores'].append(davies_bouldin_score(X, labels))
+            if score is not None:  # Silhouette requires at least 2 clusters
+                results['silhouette_scores'].append(score[0])
+                results['calinski_harabasz_scores'].append(score[1])
+                results['davies_bouldin_scores'].append(score[2])
             
-            print(f"k={k}: Inertia={kmeans.inertia_:.2f}", end="")
-            if k > 1:
+            print(f"k={k}: Inertia={inertia:.2f}", end="")
+            if score is not None:
                 print(f", Silhouette={results['silhouette_scores'][-1]:.3f}")
             else:
                 print()
@@ -225,6 +678,8 @@ class DBSCANClusterer(ClusteringModel):
         self.min_samples = min_samples
         self.model = DBSCAN(eps=eps, min_samples=min_samples, metric=metric)
         self.n_noise = None
+        self._nn = None
+        self._nn_source = None
     
     def fit(self, X):
         """
@@ -240,9 +695,24 @@ class DBSCANClusterer(ClusteringModel):
         array
             Cluster labels (-1 for noise)
         """
-        self.labels = self.model.fit_predict(X)
-        self.n_clusters = len(set(self.labels)) - (1 if -1 in self.labels else 0)
-        self.n_noise = list(self.labels).count(-1)
+        # The index is keyed on the caller's array, since _prepare() returns a
+        # new copy for anything that is not already contiguous float32
+        reuse_index = (self._nn is not None and X is self._nn_source
+                       and self.model.metric == 'euclidean')
+        X = self._prepare(X)
+        
+        if reuse_index:
+            # Reuse the index from find_optimal_eps instead of letting
+            # DBSCAN build its own tree over the same points
+            graph = self._nn.radius_neighbors_graph(X, radius=self.eps, mode='distance')
+            self.model.set_params(metric='precomputed')
+            try:
+                self.labels = self.model.fit_predict(graph)
+            finally:
+                self.model.set_params(metric='euclidean')
+        else:
+            self.labels = self.model.fit_predict(X)
+        self.n_clusters, self.n_noise = _count_clusters(self.labels)
         
         print(f"DBSCAN identified {self.n_clusters} clusters")
         print(f"Noise points: {self.n_noise} ({self.n_noise/len(X)*100:.2f}%)")
@@ -272,9 +742,13 @@ class DBSCANClusterer(ClusteringModel):
         """
         print(f"Computing {k}-nearest neighbors for optimal eps...")
         
+        # Keep the fitted index so fit() on the same data can skip its own build
+        self._nn_source = X
+        X = self._prepare(X)
         neighbors = NearestNeighbors(n_neighbors=k)
         neighbors.fit(X)
-        distances, indices = neighbors.kneighbors(X)
+        distances, _ = neighbors.kneighbors(X)
+        self._nn = neighbors
         
         # Sort distances
         distances = np.sort(distances[:, k-1], axis=0)
@@ -324,19 +798,24 @@ class DBSCANClusterer(ClusteringModel):
         pd.DataFrame
             Results for each parameter combination
         """
-        from sklearn.metrics import silhouette_score
-        
         print("Performing grid search for DBSCAN parameters...")
         
+        X = self._prepare(X)
+        
+        # One neighbor graph at the largest eps serves every combination
+        neighbors = NearestNeighbors(radius=max(eps_values)).fit(X)
+        full_graph = neighbors.radius_neighbors_graph(X, mode='distance')
+        
         results = []
+        silhouette_cache = {}
         
         for eps in eps_values:
+            eps_graph = _restrict_radius_graph(full_graph, eps)
             for min_samples in min_samples_values:
-                dbscan = DBSCAN(eps=eps, min_samples=min_samples)
-                labels = dbscan.fit_predict(X)
+                dbscan = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed')
+                labels = dbscan.fit_predict(eps_graph)
                 
-                n_clusters = len(set(labels)) - (1 if -1 in labels else 0)
-                n_noise = list(labels).count(-1)
+                n_clusters, n_noise = _count_clusters(labels)
                 noise_pct = (n_noise / len(X)) * 100
                 
                 # Calculate silhouette score (only if we have clusters)
@@ -344,7 +823,11 @@ class DBSCANClusterer(ClusteringModel):
                     # Exclude noise points for silhouette calculation
                     mask = labels != -1
                     if mask.sum() > n_clusters:
-                        silhouette = silhouette_score(X[mask], labels[mask])
+                        # Different parameters often yield the same labeling
+                        key = labels.tobytes()
+                        if key not in silhouette_cache:
+                            silhouette_cache[key] = _sampled_silhouette(X[mask], labels[mask])
+                        silhouette = silhouette_cache[key]
                     else:
                         silhouette = -1
                 else:
@@ -382,6 +865,8 @@ class HierarchicalClusterer(ClusteringModel):
         """
         super().__init__(model_type='hierarchical')
         self.n_clusters = n_clusters
+        self.linkage_method = linkage
+        # Kept for API compatibility; fit() works from the scipy linkage matrix
         self.model = AgglomerativeClustering(n_clusters=n_clusters, linkage=linkage)
         self.linkage_matrix = None
     
@@ -399,10 +884,11 @@ class HierarchicalClusterer(ClusteringModel):
         array
             Cluster labels
         """
-        self.labels = self.model.fit_predict(X)
+        X = self._prepare(X)
         
-        # Create linkage matrix for dendrogram
-        self.linkage_matrix = linkage(X, method='ward')
+        # A single linkage computation serves both the labels and the dendrogram
+        self.linkage_matrix = linkage(X, method=self.linkage_method)
+        self.labels = fcluster(self.linkage_matrix, t=self.n_clusters, criterion='maxclust') - 1
         
         print(f"Hierarchical clustering fitted with {self.n_clusters} clusters")
         
@@ -481,6 +967,7 @@ class GMMClusterer(ClusteringModel):
         array
             Cluster labels
         """
+        X = self._prepare(X)
         self.model.fit(X)
         self.labels = self.model.predict(X)
         
@@ -504,11 +991,11 @@ class GMMClusterer(ClusteringModel):
         array
             Cluster labels
         """
-        return self.model.predict(X)
+        return self.model.predict(self._prepare(X))
     
     def predict_proba(self, X):
         """Get probability distributions."""
-        return self.model.predict_proba(X)
+        return self.model.predict_proba(self._prepare(X))
 
 
 # Example usage
@@ -5,6 +5,9 @@ Handles data loading from various sources and synthetic data generation.
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 from faker import Faker
 from datetime import datetime, timedelta
 import os
@@ -34,7 +37,7 @@ class CustomerDataLoader:
         Parameters:
         -----------
         filename : str
-            Name of the CSV file
+            Name of the CSV file (files ending in .parquet are read as Parquet)
         subdirectory : str
             Subdirectory ('raw', 'processed', 'synthetic')
             
@@ -48,13 +51,16 @@ class CustomerDataLoader:
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"File not found: {filepath}")
         
-        df = pd.read_csv(filepath)
+        if filename.endswith('.parquet'):
+            df = pd.read_parquet(filepath)
+        else:
+            df = pd.read_csv(filepath)
         print(f"Loaded {len(df)} records from {filename}")
         print(f"Shape: {df.shape}")
         
         return df
     
-    def save_csv(self, df, filename, subdirectory='processed'):
+    def save_csv(self, df, filename, subdirectory='processed', format='csv'):
         """
         Save dataframe to CSV file.
         
@@ -66,9 +72,26 @@ class CustomerDataLoader:
             Output filename
         subdirectory : str
             Subdirectory to save to
+        format : str
+            'csv' or 'parquet' (zstd-compressed)
         """
         filepath = os.path.join(self.data_dir, subdirectory, filename)
-        df.to_csv(filepath, index=False)
+        
+        if format == 'parquet':
+            # Parquet needs one type per column, so a mixed-type object
+            # column raises here just as df.to_parquet would
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            pq.write_table(table, filepath, compression='zstd')
+        elif format == 'csv':
+            try:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # Mixed-type object columns Arrow cannot convert; pandas writes them
+                df.to_csv(filepath, index=False)
+            else:
+                pacsv.write_csv(table, filepath)
+        else:
+            raise ValueError(f"Unknown output format: {format}")
         print(f"Saved {len(df)} records to {filepath}")
     
     def generate_synthetic_data(self, n_customers=2000, random_state=42):
@@ -87,7 +110,7 @@ class CustomerDataLoader:
         pd.DataFrame
             Synthetic customer dataset
         """
-        np.random.seed(random_state)
+        rng = np.random.default_rng(random_state)
         fake = Faker()
         Faker.seed(random_state)
         
@@ -97,108 +120,118 @@ class CustomerDataLoader:
         customer_ids = [f"CUST_{str(i).zfill(6)}" for i in range(1, n_customers + 1)]
         
         # Demographic features
-        ages = np.random.normal(45, 15, n_customers).astype(int)
+        ages = rng.normal(45, 15, n_customers).astype(int)
         ages = np.clip(ages, 18, 80)
         
-        genders = np.random.choice(['Male', 'Female', 'Other'], 
-                                    n_customers, 
-                                    p=[0.48, 0.48, 0.04])
+        # Categorical features are sampled as integer codes and stored as
+        # pandas Categoricals rather than object arrays of strings
+        genders = pd.Categorical.from_codes(
+            rng.choice(3, n_customers, p=[0.48, 0.48, 0.04]).astype(np.int8),
+            categories=['Male', 'Female', 'Other']
+        )
         
-        marital_status = np.random.choice(['Single', 'Married', 'Divorced', 'Widowed'],
-                                           n_customers,
-                                           p=[0.30, 0.50, 0.15, 0.05])
+        marital_status = pd.Categorical.from_codes(
+            rng.choice(4, n_customers, p=[0.30, 0.50, 0.15, 0.05]).astype(np.int8),
+            categories=['Single', 'Married', 'Divorced', 'Widowed']
+        )
         
-        education = np.random.choice(['High School', 'Bachelor', 'Master', 'PhD'],
-                                      n_customers,
-                                      p=[0.25, 0.45, 0.25, 0.05])
+        education_codes = rng.choice(4, n_customers, p=[0.25, 0.45, 0.25, 0.05]).astype(np.int8)
+        education = pd.Categorical.from_codes(
+            education_codes,
+            categories=['High School', 'Bachelor', 'Master', 'PhD']
+        )
         
         # Income based on age and education (with correlation)
-        base_income = np.random.normal(60000, 25000, n_customers)
-        education_bonus = np.where(education == 'PhD', 40000,
-                                    np.where(education == 'Master', 25000,
-                                             np.where(education == 'Bachelor', 10000, 0)))
+        base_income = rng.normal(60000, 25000, n_customers)
+        # Bonus per education code: High School, Bachelor, Master, PhD
+        bonus_table = np.array([0, 10000, 25000, 40000])
+        education_bonus = bonus_table[education_codes]
         age_factor = (ages - 18) * 500
         incomes = base_income + education_bonus + age_factor
         incomes = np.clip(incomes, 20000, 200000).astype(int)
         
-        # Geographic location
-        cities = [fake.city() for _ in range(n_customers)]
+        # Geographic location: sample from a pool of generated cities since
+        # repeats are expected and Faker is slow per call
+        city_pool = np.array([fake.city() for _ in range(min(500, n_customers))])
+        cities = pd.Categorical(city_pool[rng.integers(0, len(city_pool), n_customers)])
         
         # Behavioral features (RFM)
         # Create distinct customer groups through different distributions
-        segment_distribution = np.random.choice([0, 1, 2, 3, 4], n_customers, 
+        segment_distribution = rng.choice([0, 1, 2, 3, 4], n_customers, 
                                                  p=[0.15, 0.25, 0.30, 0.20, 0.10])
         
-        recency = []
-        frequency = []
-        monetary = []
-        
-        for segment in segment_distribution:
-            if segment == 0:  # VIP Champions
-                recency.append(np.random.randint(1, 15))
-                frequency.append(np.random.randint(15, 30))
-                monetary.append(np.random.randint(8000, 20000))
-            elif segment == 1:  # Loyal Customers
-                recency.append(np.random.randint(15, 45))
-                frequency.append(np.random.randint(8, 20))
-                monetary.append(np.random.randint(3000, 10000))
-            elif segment == 2:  # Potential Loyalists
-                recency.append(np.random.randint(20, 60))
-                frequency.append(np.random.randint(5, 12))
-                monetary.append(np.random.randint(1500, 5000))
-            elif segment == 3:  # Price Sensitive
-                recency.append(np.random.randint(30, 90))
-                frequency.append(np.random.randint(3, 8))
-                monetary.append(np.random.randint(500, 2500))
-            else:  # At Risk/Dormant
-                recency.append(np.random.randint(90, 365))
-                frequency.append(np.random.randint(1, 5))
-                monetary.append(np.random.randint(200, 1500))
-        
-        recency = np.array(recency)
-        frequency = np.array(frequency)
-        monetary = np.array(monetary)
+        # Per-segment sampling bounds, indexed by segment id:
+        # VIP Champions, Loyal Customers, Potential Loyalists,
+        # Price Sensitive, At Risk/Dormant
+        rec_lo = np.array([1, 15, 20, 30, 90])
+        rec_hi = np.array([15, 45, 60, 90, 365])
+        freq_lo = np.array([15, 8, 5, 3, 1])
+        freq_hi = np.array([30, 20, 12, 8, 5])
+        mon_lo = np.array([8000, 3000, 1500, 500, 200])
+        mon_hi = np.array([20000, 10000, 5000, 2500, 1500])
+        
+        recency = rng.integers(rec_lo[segment_distribution], rec_hi[segment_distribution])
+        frequency = rng.integers(freq_lo[segment_distribution], freq_hi[segment_distribution])
+        monetary = rng.integers(mon_lo[segment_distribution], mon_hi[segment_distribution])
         
         # Calculate derived metrics
         avg_order_value = monetary / frequency
         
-        # Engagement features
-        website_visits = np.random.poisson(frequency * 2, n_customers)
-        email_open_rate = np.random.uniform(0.1, 0.9, n_customers)
-        email_click_rate = email_open_rate * np.random.uniform(0.1, 0.5, n_customers)
+        # Engagement features; the Poisson rates share one scratch buffer
+        # that is refilled in place rather than allocating frequency * k
+        lam = np.empty(n_customers, dtype=np.float64)
+        np.multiply(frequency, 2.0, out=lam)
+        website_visits = rng.poisson(lam)
+        email_open_rate = rng.uniform(0.1, 0.9, n_customers)
+        email_click_rate = rng.uniform(0.1, 0.5, n_customers)
+        np.multiply(email_click_rate, email_open_rate, out=email_click_rate)
         
         # Tenure (days as customer)
-        tenure_days = np.random.randint(30, 1825, n_customers)  # 1 month to 5 years
+        tenure_days = rng.integers(30, 1825, n_customers)  # 1 month to 5 years
         
         # Channel preference
-        channel_pref = np.random.choice(['Online', 'In-Store', 'Mobile', 'Mixed'],
-                                         n_customers,
-                                         p=[0.35, 0.25, 0.20, 0.20])
+        channel_pref = pd.Categorical.from_codes(
+            rng.choice(4, n_customers, p=[0.35, 0.25, 0.20, 0.20]).astype(np.int8),
+            categories=['Online', 'In-Store', 'Mobile', 'Mixed']
+        )
         
         # Product categories (number of different categories purchased)
-        num_categories = np.random.randint(1, 8, n_customers)
+        num_categories = rng.integers(1, 8, n_customers)
         
         # Discount usage
-        discount_usage = np.random.uniform(0, 0.8, n_customers)
+        discount_usage = rng.uniform(0, 0.8, n_customers)
         
         # Returns
-        num_returns = np.random.poisson(frequency * 0.1, n_customers)
+        np.multiply(frequency, 0.1, out=lam)
+        num_returns = rng.poisson(lam)
         
         # Payment method
-        payment_method = np.random.choice(['Credit Card', 'Debit Card', 'PayPal', 'Cash'],
-                                           n_customers,
-                                           p=[0.45, 0.30, 0.15, 0.10])
+        payment_method = pd.Categorical.from_codes(
+            rng.choice(4, n_customers, p=[0.45, 0.30, 0.15, 0.10]).astype(np.int8),
+            categories=['Credit Card', 'Debit Card', 'PayPal', 'Cash']
+        )
         
         # Customer service interactions
-        cs_interactions = np.random.poisson(2, n_customers)
+        cs_interactions = rng.poisson(2, n_customers)
         
         # Loyalty program
-        loyalty_member = np.random.choice([True, False], n_customers, p=[0.65, 0.35])
+        loyalty_member = rng.choice([True, False], n_customers, p=[0.65, 0.35]).astype(np.bool_)
         
-        # Create DataFrame
+        # Add some missing values to make it realistic; Income is stored as
+        # float so it can hold NaN
+        incomes = incomes.astype(np.float64)
+        missing_indices = rng.choice(n_customers, size=int(n_customers * 0.03), replace=False)
+        incomes[missing_indices] = np.nan
+        
+        missing_indices = rng.choice(n_customers, size=int(n_customers * 0.02), replace=False)
+        email_open_rate[missing_indices] = np.nan
+        
+        # Build the frame once, with columns already in their final order;
+        # copy=False lets pandas keep each array as its own block instead
+        # of copying them into consolidated 2D blocks
         df = pd.DataFrame({
             'CustomerID': customer_ids,
-            'Age': ages,
+            'Age': ages.astype(np.int16),
             'Gender': genders,
             'MaritalStatus': marital_status,
             'Education': education,
@@ -213,27 +246,20 @@ class CustomerDataLoader:
             'EmailClickRate': email_click_rate,
             'TenureDays': tenure_days,
             'ChannelPreference': channel_pref,
-            'NumCategories': num_categories,
+            'NumCategories': num_categories.astype(np.int8),
             'DiscountUsage': discount_usage,
-            'NumReturns': num_returns,
+            'NumReturns': num_returns.astype(np.int8),
             'PaymentMethod': payment_method,
-            'CSInteractions': cs_interactions,
+            'CSInteractions': cs_interactions.astype(np.int8),
             'LoyaltyMember': loyalty_member
-        })
-        
-        # Add some missing values to make it realistic
-        missing_indices = np.random.choice(df.index, size=int(n_customers * 0.03), replace=False)
-        df.loc[missing_indices, 'Income'] = np.nan
-        
-        missing_indices = np.random.choice(df.index, size=int(n_customers * 0.02), replace=False)
-        df.loc[missing_indices, 'EmailOpenRate'] = np.nan
+        }, copy=False)
         
         print(f"Generated dataset shape: {df.shape}")
         print(f"Features: {df.columns.tolist()}")
         
         return df
     
-    def get_data_summary(self, df):
+    def get_data_summary(self, df, sample_size=None):
         """
         Get comprehensive summary of the dataset.
         
@@ -241,27 +267,36 @@ class CustomerDataLoader:
         -----------
         df : pd.DataFrame
             Input dataframe
+        sample_size : int
+            Compute numeric statistics on a random sample of at most this
+            many rows (None = use all rows)
             
         Returns:
         --------
         dict
             Dictionary containing summary statistics
         """
+        missing = df.isnull().sum()
+        
+        stats_df = df
+        if sample_size is not None and len(df) > sample_size:
+            stats_df = df.sample(sample_size, random_state=0)
+        
         summary = {
             'shape': df.shape,
             'columns': df.columns.tolist(),
             'dtypes': df.dtypes.to_dict(),
-            'missing_values': df.isnull().sum().to_dict(),
-            'missing_percentage': (df.isnull().sum() / len(df) * 100).to_dict(),
+            'missing_values': missing.to_dict(),
+            'missing_percentage': (missing / len(df) * 100).to_dict(),
             'memory_usage': df.memory_usage(deep=True).sum() / 1024**2,  # MB
-            'numeric_summary': df.describe().to_dict(),
-            'categorical_columns': df.select_dtypes(include=['object', 'bool']).columns.tolist(),
+            'numeric_summary': stats_df.describe().to_dict(),
+            'categorical_columns': df.select_dtypes(include=['object', 'category', 'bool']).columns.tolist(),
             'numeric_columns': df.select_dtypes(include=[np.number]).columns.tolist()
         }
         
         return summary
     
-    def print_data_summary(self, df):
+    def print_data_summary(self, df, sample_size=10000):
         """
         Print comprehensive data summary.
         
@@ -269,24 +304,28 @@ class CustomerDataLoader:
         -----------
         df : pd.DataFrame
             Input dataframe
+        sample_size : int
+            Rows sampled for the numerical statistics (None = all rows)
         """
+        summary = self.get_data_summary(df, sample_size=sample_size)
+        
         print("=" * 80)
         print("DATASET SUMMARY")
         print("=" * 80)
         
-        print(f"\nShape: {df.shape[0]} rows × {df.shape[1]} columns")
-        print(f"Memory Usage: {df.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
+        print(f"\nShape: {summary['shape'][0]} rows × {summary['shape'][1]} columns")
+        print(f"Memory Usage: {summary['memory_usage']:.2f} MB")
         
         print("\n" + "-" * 80)
         print("DATA TYPES")
         print("-" * 80)
-        print(df.dtypes.value_counts())
+        print(pd.Series(summary['dtypes']).astype(str).value_counts())
         
         print("\n" + "-" * 80)
         print("MISSING VALUES")
         print("-" * 80)
-        missing = df.isnull().sum()
-        missing_pct = (missing / len(df)) * 100
+        missing = pd.Series(summary['missing_values'])
+        missing_pct = pd.Series(summary['missing_percentage'])
         missing_df = pd.DataFrame({
             'Missing Count': missing[missing > 0],
             'Percentage': missing_pct[missing > 0]
@@ -304,13 +343,12 @@ class CustomerDataLoader:
         print("\n" + "-" * 80)
         print("NUMERICAL FEATURES STATISTICS")
         print("-" * 80)
-        print(df.describe())
+        print(pd.DataFrame(summary['numeric_summary']))
         
         print("\n" + "-" * 80)
         print("CATEGORICAL FEATURES")
         print("-" * 80)
-        cat_cols = df.select_dtypes(include=['object', 'bool']).columns
-        for col in cat_cols:
+        for col in summary['categorical_columns']:
             print(f"\n{col}:")
             print(df[col].value_counts())
         
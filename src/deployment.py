@@ -5,11 +5,141 @@ Production pipeline for customer segmentation with API endpoints.
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import joblib
-import json
-from flask import Flask, request, jsonify
+import orjson
+import gzip
+import functools
+import hashlib
+import queue
+import threading
+import time
+from flask import Flask, Response, request
+from sklearn.preprocessing import StandardScaler, MinMaxScaler, RobustScaler
+from numba import njit
 import os
 
+# Optional ONNX export (skl2onnx) and inference (onnxruntime)
+try:
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+    _HAS_SKL2ONNX = True
+except ImportError:
+    _HAS_SKL2ONNX = False
+
+try:
+    import onnxruntime
+    _HAS_ONNXRUNTIME = True
+except ImportError:
+    _HAS_ONNXRUNTIME = False
+
+try:
+    from waitress import serve
+    _HAS_WAITRESS = True
+except ImportError:
+    _HAS_WAITRESS = False
+
+
+# ONNX metadata key holding the SHA-256 of the pickle an export was made from
+_ONNX_SOURCE_KEY = 'source_sha256'
+
+
+def _file_sha256(path):
+    """Hex SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# numpy scalars/arrays and int-keyed dicts appear in profiles and results
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _jsonify(obj):
+    """Serialize obj with orjson into a Flask JSON response."""
+    return Response(orjson.dumps(obj, option=_ORJSON_OPTIONS), mimetype='application/json')
+
+
+def _json_payload(obj):
+    """
+    Serialize obj once for repeated serving.
+    
+    Returns:
+    --------
+    tuple
+        (JSON bytes, gzip-compressed bytes or None when gzip doesn't help)
+    """
+    body = orjson.dumps(obj, option=_ORJSON_OPTIONS)
+    body_gz = gzip.compress(body, compresslevel=6, mtime=0)
+    return body, (body_gz if len(body_gz) < len(body) else None)
+
+
+# Header sets for cached bodies; Response copies them, so sharing is safe
+_PLAIN_HEADERS = {'Vary': 'Accept-Encoding'}
+_GZIP_HEADERS = {'Vary': 'Accept-Encoding', 'Content-Encoding': 'gzip'}
+
+
+def _cached_response(payload):
+    """Response for a _json_payload, gzipped when the client accepts it."""
+    body, body_gz = payload
+    if body_gz is not None and 'gzip' in request.headers.get('Accept-Encoding', ''):
+        return Response(body_gz, mimetype='application/json', headers=_GZIP_HEADERS)
+    return Response(body, mimetype='application/json', headers=_PLAIN_HEADERS)
+
+
+def _check_finite(X):
+    """Raise ValueError, as sklearn's predict does, if X has NaN or infinite values."""
+    bad_rows = ~np.isfinite(X).all(axis=1)
+    if bad_rows.any():
+        raise ValueError(f"Input contains NaN or infinity in {int(bad_rows.sum())} row(s): "
+                         f"{np.flatnonzero(bad_rows)[:10].tolist()}")
+
+
+# Scalers whose transform is x * a + c per feature, so they compose with PCA
+_AFFINE_SCALERS = (StandardScaler, MinMaxScaler, RobustScaler)
+
+
+@njit(cache=True, fastmath=True)
+def _predict_one(x, W, b, C, Cn):
+    """
+    Fused transform + nearest-centroid search for a single customer.
+    
+    Computes z = x @ W + b and the argmin of ||c||^2 - 2 z.c in plain
+    loops; returns (cluster id, Euclidean distance to that centroid).
+    """
+    n_features, n_components = W.shape
+    
+    z = b.copy()
+    for f in range(n_features):
+        xf = x[f]
+        for j in range(n_components):
+            z[j] += xf * W[f, j]
+    
+    z_sq = np.float32(0.0)
+    for j in range(n_components):
+        z_sq += z[j] * z[j]
+    
+    # Seeded from centroid 0 rather than inf: fastmath lets the compiler
+    # assume no operand is infinite
+    dot = np.float32(0.0)
+    for j in range(n_components):
+        dot += z[j] * C[0, j]
+    best_dist = Cn[0] - 2.0 * dot
+    best_idx = 0
+    for c in range(1, C.shape[0]):
+        dot = np.float32(0.0)
+        for j in range(n_components):
+            dot += z[j] * C[c, j]
+        dist = Cn[c] - 2.0 * dot
+        if dist < best_dist:
+            best_dist = dist
+            best_idx = c
+    
+    return best_idx, np.sqrt(max(best_dist + z_sq, 0.0))
+
 
 class CustomerSegmentationPipeline:
     """Production pipeline for customer segmentation."""
@@ -17,6 +147,9 @@ class CustomerSegmentationPipeline:
     def __init__(self):
         """Initialize pipeline."""
         self.model = None
+        self._ort = None
+        self._C = None
+        self._Cn = None
         self.scaler = None
         self.pca = None
         self.preprocessor = None
@@ -24,6 +157,12 @@ class CustomerSegmentationPipeline:
         self.segment_profiles = None
         self.segment_names = {}
         self.marketing_strategies = {}
+        self._W = None
+        self._b = None
+        self._feature_names_tuple = None
+        self._positions = functools.lru_cache(maxsize=8)(self._column_positions)
+        self._recommendations = functools.lru_cache(maxsize=128)(self._lookup_recommendations)
+        self._index_segments()
     
     def load_model(self, model_path='models/kmeans_model.pkl'):
         """
@@ -35,10 +174,73 @@ class CustomerSegmentationPipeline:
             Path to model file
         """
         if os.path.exists(model_path):
-            self.model = joblib.load(model_path)
+            # Memory-map arrays so multiple server workers share the pages
+            self.model = joblib.load(model_path, mmap_mode='r')
             print(f"Model loaded from {model_path}")
         else:
             print(f"Model file not found: {model_path}")
+        
+        # Cache centroids and their squared norms for direct assignment
+        self._C = None
+        self._Cn = None
+        if self.model is not None and hasattr(self.model, 'cluster_centers_'):
+            self._C = np.ascontiguousarray(self.model.cluster_centers_, dtype=np.float32)
+            self._Cn = (self._C ** 2).sum(axis=1)
+        
+            # Compile the single-row kernel now rather than on the first request
+            n_dims = self._C.shape[1]
+            _predict_one(np.zeros(1, dtype=np.float32), np.zeros((1, n_dims), dtype=np.float32),
+                         np.zeros(n_dims, dtype=np.float32), self._C, self._Cn)
+        
+        # Prefer the ONNX export next to the pickle when onnxruntime is
+        # installed, but only if it was exported from this exact pickle
+        self._ort = None
+        onnx_path = os.path.splitext(model_path)[0] + '.onnx'
+        if self.model is not None and _HAS_ONNXRUNTIME and os.path.exists(onnx_path):
+            session = onnxruntime.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+            source = session.get_modelmeta().custom_metadata_map.get(_ONNX_SOURCE_KEY)
+            if source == _file_sha256(model_path):
+                self._ort = session
+                print(f"ONNX model loaded from {onnx_path}")
+            else:
+                print(f"Warning: ignoring stale ONNX model {onnx_path} (not exported from {model_path})")
+    
+    def _predict(self, X):
+        """
+        Assign rows to their nearest cluster.
+        
+        Parameters:
+        -----------
+        X : np.array
+            Preprocessed features
+            
+        Returns:
+        --------
+        tuple
+            (cluster ids, Euclidean distance to the assigned centroid or
+            None when the model has no centroids)
+        """
+        if self._ort is not None or self._C is not None:
+            # Unlike model.predict, the ONNX and direct centroid paths would
+            # silently assign NaN rows to a cluster
+            X = np.asarray(X, dtype=np.float32)
+            _check_finite(X)
+        
+        if self._ort is not None:
+            input_name = self._ort.get_inputs()[0].name
+            outputs = self._ort.run(None, {input_name: np.asarray(X, dtype=np.float32)})
+            distances = outputs[1].min(axis=1) if len(outputs) > 1 else None
+            return outputs[0].ravel(), distances
+        
+        if self._C is not None:
+            # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2; ||x||^2 does not affect the argmin
+            X = np.asarray(X, dtype=np.float32)
+            partial = self._Cn - 2.0 * (X @ self._C.T)
+            labels = np.argmin(partial, axis=1)
+            sq_dist = partial[np.arange(len(X)), labels] + np.einsum('ij,ij->i', X, X)
+            return labels, np.sqrt(np.maximum(sq_dist, 0))
+        
+        return self.model.predict(X), None
     
     def load_preprocessor(self, preprocessor_path='models/preprocessor.pkl'):
         """
@@ -50,14 +252,58 @@ class CustomerSegmentationPipeline:
             Path to preprocessor file
         """
         if os.path.exists(preprocessor_path):
-            preprocessor_objects = joblib.load(preprocessor_path)
+            preprocessor_objects = joblib.load(preprocessor_path, mmap_mode='r')
             self.scaler = preprocessor_objects.get('scaler')
             self.pca = preprocessor_objects.get('pca')
             self.feature_names = preprocessor_objects.get('feature_names')
+            self._feature_names_tuple = (tuple(self.feature_names)
+                                         if self.feature_names is not None else None)
+            self._positions.cache_clear()
+            self._fuse_transforms()
             print(f"Preprocessor loaded from {preprocessor_path}")
         else:
             print(f"Preprocessor file not found: {preprocessor_path}")
     
+    def _fuse_transforms(self):
+        """
+        Collapse scaler (and PCA) into a single affine map X @ W + b.
+        
+        Both steps are affine, so the map is recovered exactly by pushing
+        the origin and the unit vectors through the fitted transformers.
+        """
+        self._W = None
+        self._b = None
+        
+        if not isinstance(self.scaler, _AFFINE_SCALERS) or self.feature_names is None:
+            return
+        
+        n_features = len(self.feature_names)
+        probe = np.vstack([np.zeros((1, n_features)), np.eye(n_features)])
+        out = self.scaler.transform(probe)
+        if self.pca is not None:
+            out = self.pca.transform(out)
+        
+        # Served in float32: ample precision for these features, half the bandwidth
+        self._b = out[0].astype(np.float32)
+        self._W = np.ascontiguousarray(out[1:] - out[0], dtype=np.float32)
+    
+    def _column_positions(self, columns):
+        """
+        Locate each model feature in a column layout.
+        
+        Parameters:
+        -----------
+        columns : tuple
+            Column names of the incoming frame
+            
+        Returns:
+        --------
+        np.array
+            Position of each feature in columns (-1 if missing)
+        """
+        feature_names = self._feature_names_tuple or tuple(self.feature_names)
+        return pd.Index(columns).get_indexer(feature_names)
+    
     def load_segment_info(self, profiles_path='models/segment_profiles.json',
                            names_path='models/segment_names.json',
                            strategies_path='models/marketing_strategies.json'):
@@ -74,20 +320,56 @@ class CustomerSegmentationPipeline:
             Path to marketing strategies JSON
         """
         if os.path.exists(profiles_path):
-            with open(profiles_path, 'r') as f:
-                self.segment_profiles = json.load(f)
+            with open(profiles_path, 'rb') as f:
+                self.segment_profiles = orjson.loads(f.read())
             print(f"Segment profiles loaded from {profiles_path}")
         
         if os.path.exists(names_path):
-            with open(names_path, 'r') as f:
+            with open(names_path, 'rb') as f:
                 # Convert string keys back to integers
-                self.segment_names = {int(k): v for k, v in json.load(f).items()}
+                self.segment_names = {int(k): v for k, v in orjson.loads(f.read()).items()}
             print(f"Segment names loaded from {names_path}")
         
         if os.path.exists(strategies_path):
-            with open(strategies_path, 'r') as f:
-                self.marketing_strategies = json.load(f)
+            with open(strategies_path, 'rb') as f:
+                self.marketing_strategies = orjson.loads(f.read())
             print(f"Marketing strategies loaded from {strategies_path}")
+        
+        self._index_segments()
+    
+    def _index_segments(self):
+        """Rebuild the name index and response caches after segment info changes."""
+        # Name -> id for segments that have a strategy; the first id wins
+        self._name_to_id = {}
+        for seg_id, name in self.segment_names.items():
+            if str(seg_id) in self.marketing_strategies:
+                self._name_to_id.setdefault(name, seg_id)
+        
+        self._recommendations.cache_clear()
+        self._build_json_cache()
+    
+    def _build_json_cache(self):
+        """
+        Serialize (and gzip) the static segment endpoints' responses once.
+        
+        Segment info only changes through load_segment_info, which calls
+        this again, so the API can return the cached bytes directly.
+        """
+        self._segments_json = _json_payload({
+            "segments": {str(k): v for k, v in self.segment_names.items()},
+            "count": len(self.segment_names)
+        })
+        
+        self._profile_json = {
+            str(k): _json_payload(v) for k, v in (self.segment_profiles or {}).items()
+        }
+        
+        # Strategies are reachable by segment name as well as by id; ids win
+        strategy_json = {k: _json_payload(v) for k, v in self.marketing_strategies.items()}
+        self._recommendations_json = {
+            name: strategy_json[str(seg_id)] for name, seg_id in self._name_to_id.items()
+        }
+        self._recommendations_json.update(strategy_json)
     
     def preprocess_customer(self, customer_data):
         """
@@ -106,20 +388,30 @@ class CustomerSegmentationPipeline:
         if isinstance(customer_data, dict):
             df = pd.DataFrame([customer_data])
         else:
-            df = customer_data.copy()
+            # Only read from the input, so no copy is needed
+            df = customer_data
         
         # Apply scaling if scaler is loaded
         if self.scaler is not None and self.feature_names is not None:
-            # Ensure all required features are present
-            missing_features = set(self.feature_names) - set(df.columns)
-            if missing_features:
+            # Column positions are cached per input schema
+            positions = self._positions(tuple(df.columns))
+            
+            if (positions >= 0).all():
+                X = df.iloc[:, positions].to_numpy()
+            else:
+                missing_features = {feat for feat, pos in zip(self.feature_names, positions)
+                                    if pos < 0}
                 print(f"Warning: Missing features: {missing_features}")
-                # Fill missing with zeros or median
-                for feat in missing_features:
-                    df[feat] = 0
+                
+                # Select and order features, filling missing ones with zeros
+                X = np.column_stack([
+                    df.iloc[:, pos].to_numpy() if pos >= 0 else np.zeros(len(df))
+                    for pos in positions
+                ])
+            if self._W is not None:
+                # Scaling and PCA in one GEMM
+                return X.astype(np.float32, copy=False) @ self._W + self._b
             
-            # Select and order features
-            X = df[self.feature_names].values
             X_scaled = self.scaler.transform(X)
             
             # Apply PCA if available
@@ -147,27 +439,98 @@ class CustomerSegmentationPipeline:
         if self.model is None:
             return {"error": "Model not loaded"}
         
-        # Preprocess
-        X = self.preprocess_customer(customer_data)
+        return self.predict_segments(customer_data)[0]
+    
+    def predict_segments(self, customer_data):
+        """
+        Predict segments for several customers with one model call.
+        
+        Parameters:
+        -----------
+        customer_data : list of dict or pd.DataFrame
+            Customer features, one record per customer
+            
+        Returns:
+        --------
+        list of dict or dict
+            Prediction results in input order, or an error dict
+        """
+        if self.model is None:
+            return {"error": "Model not loaded"}
         
-        # Predict
-        cluster_id = int(self.model.predict(X)[0])
+        if isinstance(customer_data, dict):
+            customer_data = [customer_data]
         
-        # Get segment name
-        segment_name = self.segment_names.get(cluster_id, f"Segment {cluster_id}")
+        if (isinstance(customer_data, list) and len(customer_data) == 1
+                and self._W is not None and self._C is not None and self._ort is None):
+            # Single record: skip the DataFrame and run the fused numba kernel
+            labels, distances = self._predict_record(customer_data[0])
+        else:
+            if isinstance(customer_data, list):
+                customer_data = self._records_frame(customer_data)
+            
+            # Preprocess
+            X = self.preprocess_customer(customer_data)
+            
+            # Predict
+            labels, distances = self._predict(X)
         
-        # Prepare response
-        result = {
-            'cluster_id': cluster_id,
-            'segment_name': segment_name,
-            'confidence': 'high'  # Could calculate distance to centroid
-        }
+        results = []
+        for i, label in enumerate(labels):
+            cluster_id = int(label)
+            
+            # Get segment name
+            segment_name = self.segment_names.get(cluster_id, f"Segment {cluster_id}")
+            
+            # Prepare response
+            result = {
+                'cluster_id': cluster_id,
+                'segment_name': segment_name,
+                'confidence': 'high'
+            }
+            
+            # Closer to the centroid means a more typical member of the segment
+            if distances is not None:
+                distance = float(distances[i])
+                result['distance_to_centroid'] = distance
+                result['confidence'] = 1.0 / (1.0 + distance)
+            
+            # Add segment characteristics if available
+            if self.segment_profiles and str(cluster_id) in self.segment_profiles:
+                result['segment_characteristics'] = self.segment_profiles[str(cluster_id)]
+            
+            results.append(result)
+        
+        return results
+    
+    def _records_frame(self, records):
+        """
+        Frame a list of customer dicts on feature_names.
+        
+        Missing features are zero-filled with a warning, exactly as for a
+        single record, rather than left as NaN by pd.DataFrame(records).
+        """
+        if self.feature_names is None:
+            return pd.DataFrame(records)
         
-        # Add segment characteristics if available
-        if self.segment_profiles and str(cluster_id) in self.segment_profiles:
-            result['segment_characteristics'] = self.segment_profiles[str(cluster_id)]
+        missing_features = {feat for record in records for feat in self.feature_names
+                            if feat not in record}
+        if missing_features:
+            print(f"Warning: Missing features: {missing_features}")
         
-        return result
+        return pd.DataFrame([[record.get(feat, 0) for feat in self.feature_names] for record in records],
+                            columns=self.feature_names, dtype=np.float64)
+    
+    def _predict_record(self, record):
+        """Predict one customer dict with the fused single-row kernel."""
+        missing_features = {feat for feat in self.feature_names if feat not in record}
+        if missing_features:
+            print(f"Warning: Missing features: {missing_features}")
+        
+        x = np.array([record.get(feat, 0) for feat in self.feature_names], dtype=np.float32)
+        _check_finite(x[np.newaxis, :])
+        label, distance = _predict_one(x, self._W, self._b, self._C, self._Cn)
+        return np.array([label]), np.array([distance])
     
     def get_recommendations(self, segment_id_or_name):
         """
@@ -183,22 +546,31 @@ class CustomerSegmentationPipeline:
         dict
             Marketing recommendations
         """
+        return self._recommendations(segment_id_or_name)
+    
+    def _lookup_recommendations(self, segment_id_or_name):
+        """Uncached body of get_recommendations."""
         # Try to find by ID first
-        segment_key = str(segment_id_or_name)
+        strategy = self.marketing_strategies.get(str(segment_id_or_name))
+        if strategy is not None:
+            return strategy
         
-        if segment_key in self.marketing_strategies:
-            return self.marketing_strategies[segment_key]
-        
-        # Try to find by name
-        for seg_id, name in self.segment_names.items():
-            if name == segment_id_or_name:
-                segment_key = str(seg_id)
-                if segment_key in self.marketing_strategies:
-                    return self.marketing_strategies[segment_key]
+        # Then by name
+        seg_id = self._name_to_id.get(segment_id_or_name)
+        if seg_id is not None:
+            return self.marketing_strategies[str(seg_id)]
         
         return {"error": "Segment not found"}
     
-    def batch_score(self, customers_df, output_path='data/processed/scored_customers.csv'):
+    def _segment_labels(self, cluster_ids):
+        """Segment names for cluster ids; unnamed clusters become "Segment <id>"."""
+        id_series = pd.Series(cluster_ids)
+        seg_series = id_series.map(self.segment_names)
+        seg_series = seg_series.where(seg_series.notna(), "Segment " + id_series.astype(str))
+        return seg_series.to_numpy()
+    
+    def batch_score(self, customers_df, output_path='data/processed/scored_customers.csv',
+                    chunk_size=100_000):
         """
         Score entire customer database.
         
@@ -208,6 +580,8 @@ class CustomerSegmentationPipeline:
             Customer dataframe
         output_path : str
             Path to save scored results
+        chunk_size : int
+            Rows preprocessed, scored and appended to the CSV at a time
             
         Returns:
         --------
@@ -220,21 +594,67 @@ class CustomerSegmentationPipeline:
         
         print(f"Scoring {len(customers_df)} customers...")
         
-        # Preprocess
-        X = self.preprocess_customer(customers_df)
+        # Existing Cluster/Segment columns are replaced and moved to the end
+        base_df = customers_df.drop(columns=['Cluster', 'Segment'], errors='ignore')
+        
+        # Output schema inferred from the whole frame, so a chunk whose
+        # object column happens to be all-null still matches
+        try:
+            schema = pa.Schema.from_pandas(base_df, preserve_index=False)
+            schema = schema.append(pa.field('Cluster', pa.int64()))
+            schema = schema.append(pa.field('Segment', pa.string()))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed-type object columns Arrow cannot convert; pandas writes them
+            schema = None
+        
+        cluster_chunks = []
+        segment_chunks = []
+        
+        # Opened up front so an empty input still produces a header-only CSV.
+        # Only one chunk's features and output table are alive at a time
+        if schema is not None:
+            writer = pacsv.CSVWriter(output_path, schema)
+        else:
+            writer = None
+            base_df.iloc[:0].assign(Cluster=np.empty(0, dtype=np.int64), Segment='').to_csv(
+                output_path, index=False)
+        try:
+            for start in range(0, len(customers_df), chunk_size):
+                chunk = customers_df.iloc[start:start + chunk_size]
+                
+                # Preprocess and predict
+                X = self.preprocess_customer(chunk)
+                cluster_ids = np.asarray(self._predict(X)[0])
+                segments = self._segment_labels(cluster_ids)
+                
+                cluster_chunks.append(cluster_ids)
+                segment_chunks.append(segments)
+                
+                # Append to the CSV
+                scored = base_df.iloc[start:start + chunk_size].assign(Cluster=cluster_ids,
+                                                                      Segment=segments)
+                if writer is not None:
+                    try:
+                        table = pa.Table.from_pandas(scored, schema=schema, preserve_index=False)
+                    except (pa.ArrowInvalid, pa.ArrowTypeError):
+                        # Header and earlier chunks are already written;
+                        # pandas appends the rest
+                        writer.close()
+                        writer = None
+                    else:
+                        writer.write_table(table)
+                        continue
+                scored.to_csv(output_path, mode='a', header=False, index=False)
+        finally:
+            if writer is not None:
+                writer.close()
         
-        # Predict
-        cluster_ids = self.model.predict(X)
+        print(f"Scored customers saved to {output_path}")
         
         # Add to dataframe
-        result_df = customers_df.copy()
-        result_df['Cluster'] = cluster_ids
-        result_df['Segment'] = [self.segment_names.get(cid, f"Segment {cid}") 
-                                  for cid in cluster_ids]
-        
-        # Save
-        result_df.to_csv(output_path, index=False)
-        print(f"Scored customers saved to {output_path}")
+        cluster_ids = np.concatenate(cluster_chunks) if cluster_chunks else np.empty(0, dtype=np.intp)
+        segments = np.concatenate(segment_chunks) if segment_chunks else np.empty(0, dtype=object)
+        result_df = customers_df.assign(Cluster=cluster_ids, Segment=segments)
         
         # Summary
         print(f"\nSegment Distribution:")
@@ -270,9 +690,33 @@ class CustomerSegmentationPipeline:
         os.makedirs(models_dir, exist_ok=True)
         
         # Save model
-        joblib.dump(model, os.path.join(models_dir, 'kmeans_model.pkl'))
+        model_path = os.path.join(models_dir, 'kmeans_model.pkl')
+        joblib.dump(model, model_path)
         print(f"Model saved")
         
+        # An export left over from a previous model must not outlive it,
+        # even if this export is skipped or fails
+        onnx_path = os.path.join(models_dir, 'kmeans_model.onnx')
+        if os.path.exists(onnx_path):
+            os.remove(onnx_path)
+        
+        # Export to ONNX alongside the pickle for faster serving
+        if _HAS_SKL2ONNX and hasattr(model, 'cluster_centers_'):
+            try:
+                n_features = model.cluster_centers_.shape[1]
+                onnx_model = convert_sklearn(
+                    model, initial_types=[('X', FloatTensorType([None, n_features]))]
+                )
+                # Tie the export to the pickle it was converted from
+                source = onnx_model.metadata_props.add()
+                source.key = _ONNX_SOURCE_KEY
+                source.value = _file_sha256(model_path)
+                with open(onnx_path, 'wb') as f:
+                    f.write(onnx_model.SerializeToString())
+                print(f"ONNX model saved")
+            except Exception as e:
+                print(f"Warning: ONNX export failed: {e}")
+        
         # Save preprocessor
         preprocessor = {
             'scaler': scaler,
@@ -283,28 +727,148 @@ class CustomerSegmentationPipeline:
         print(f"Preprocessor saved")
         
         # Save segment info as JSON
-        with open(os.path.join(models_dir, 'segment_profiles.json'), 'w') as f:
-            json.dump(segment_profiles, f, indent=2)
+        json_options = _ORJSON_OPTIONS | orjson.OPT_INDENT_2
+        
+        with open(os.path.join(models_dir, 'segment_profiles.json'), 'wb') as f:
+            f.write(orjson.dumps(segment_profiles, option=json_options))
         
-        with open(os.path.join(models_dir, 'segment_names.json'), 'w') as f:
+        with open(os.path.join(models_dir, 'segment_names.json'), 'wb') as f:
             # Convert int keys to strings for JSON
-            json.dump({str(k): v for k, v in segment_names.items()}, f, indent=2)
+            f.write(orjson.dumps({str(k): v for k, v in segment_names.items()}, option=json_options))
         
-        with open(os.path.join(models_dir, 'marketing_strategies.json'), 'w') as f:
-            json.dump(marketing_strategies, f, indent=2)
+        with open(os.path.join(models_dir, 'marketing_strategies.json'), 'wb') as f:
+            f.write(orjson.dumps(marketing_strategies, option=json_options))
         
         print(f"All artifacts saved to {models_dir}/")
 
 
+class MicroBatcher:
+    """
+    Coalesce concurrent single-customer predictions into one batch.
+    
+    Request threads enqueue their record and block; a background worker
+    drains the queue for up to max_wait seconds (or max_batch_size
+    records) and scores the whole batch with a single model call.
+    """
+    
+    def __init__(self, pipeline, max_batch_size=64, max_wait=0.01, timeout=30.0):
+        """
+        Initialize micro-batcher.
+        
+        Parameters:
+        -----------
+        pipeline : CustomerSegmentationPipeline
+            Pipeline used to score batches
+        max_batch_size : int
+            Maximum records scored together
+        max_wait : float
+            Seconds to wait for more records after the first arrives
+        timeout : float
+            Seconds a request waits for its result before giving up
+        """
+        self.pipeline = pipeline
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+    
+    def submit(self, customer_data):
+        """
+        Score one customer, blocking until its batch has been processed.
+        
+        Parameters:
+        -----------
+        customer_data : dict
+            Customer features
+            
+        Returns:
+        --------
+        dict
+            Prediction result
+        """
+        self._ensure_worker()
+        slot = {'data': customer_data, 'event': threading.Event()}
+        self._queue.put(slot)
+        if not slot['event'].wait(self.timeout):
+            raise TimeoutError(f"Prediction not ready after {self.timeout} seconds")
+        
+        if 'error' in slot:
+            raise slot['error']
+        return slot['result']
+    
+    def _ensure_worker(self):
+        """Start the worker thread on first use."""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+    
+    def _run(self):
+        """Worker loop: collect a batch, score it, wake the waiting requests."""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            # Nothing may escape this loop: a dead worker would leave every
+            # waiting request blocked, so failures become per-slot errors
+            # and every slot is always woken
+            try:
+                # Records with the same keys share a frame, so a field missing
+                # from one request never turns into NaN for another
+                groups = {}
+                for slot in batch:
+                    groups.setdefault(tuple(slot['data']), []).append(slot)
+                
+                for slots in groups.values():
+                    self._score(slots)
+            except Exception as e:
+                for slot in batch:
+                    if 'result' not in slot and 'error' not in slot:
+                        slot['error'] = e
+            finally:
+                for slot in batch:
+                    slot['event'].set()
+    
+    def _score(self, slots):
+        """Score a group of slots, falling back to one-by-one on failure."""
+        try:
+            results = self.pipeline.predict_segments([slot['data'] for slot in slots])
+            if isinstance(results, dict):
+                results = [results] * len(slots)
+            for slot, result in zip(slots, results):
+                slot['result'] = result
+        except Exception:
+            # Isolate the bad record instead of failing the whole batch
+            for slot in slots:
+                try:
+                    slot['result'] = self.pipeline.predict_segment(slot['data'])
+                except Exception as e:
+                    slot['error'] = e
+        finally:
+            for slot in slots:
+                slot['event'].set()
+
+
 # Flask API
 app = Flask(__name__)
 pipeline = CustomerSegmentationPipeline()
+batcher = MicroBatcher(pipeline)
 
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({"status": "healthy", "model_loaded": pipeline.model is not None})
+    return _jsonify({"status": "healthy", "model_loaded": pipeline.model is not None})
 
 
 @app.route('/predict', methods=['POST'])
@@ -316,43 +880,65 @@ def predict_segment():
     Returns: Segment prediction
     """
     try:
-        customer_data = request.json
-        result = pipeline.predict_segment(customer_data)
-        return jsonify(result)
+        customer_data = orjson.loads(request.get_data())
+        if not isinstance(customer_data, dict):
+            return _jsonify({"error": "Expected a JSON object of customer features"}), 400
+        result = batcher.submit(customer_data)
+        return _jsonify(result)
+    except Exception as e:
+        return _jsonify({"error": str(e)}), 400
+
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    """
+    Predict segments for many customers at once.
+    
+    Request body: JSON list of customer feature objects
+    Returns: List of segment predictions in request order
+    """
+    try:
+        customers = orjson.loads(request.get_data())
+        if not isinstance(customers, list) or not all(isinstance(c, dict) for c in customers):
+            return _jsonify({"error": "Expected a JSON list of customer objects"}), 400
+        if not customers:
+            return _jsonify([])
+        results = pipeline.predict_segments(customers)
+        return _jsonify(results)
     except Exception as e:
-        return jsonify({"error": str(e)}), 400
+        return _jsonify({"error": str(e)}), 400
 
 
 @app.route('/segment/<segment_id>', methods=['GET'])
 def get_segment_profile(segment_id):
     """Get segment profile by ID."""
     try:
-        segment_key = str(segment_id)
-        if segment_key in pipeline.segment_profiles:
-            return jsonify(pipeline.segment_profiles[segment_key])
+        payload = pipeline._profile_json.get(str(segment_id))
+        if payload is not None:
+            return _cached_response(payload)
         else:
-            return jsonify({"error": "Segment not found"}), 404
+            return _jsonify({"error": "Segment not found"}), 404
     except Exception as e:
-        return jsonify({"error": str(e)}), 400
+        return _jsonify({"error": str(e)}), 400
 
 
 @app.route('/recommendations/<segment_id>', methods=['GET'])
 def get_recommendations(segment_id):
     """Get marketing recommendations for segment."""
     try:
+        payload = pipeline._recommendations_json.get(segment_id)
+        if payload is not None:
+            return _cached_response(payload)
         recommendations = pipeline.get_recommendations(segment_id)
-        return jsonify(recommendations)
+        return _jsonify(recommendations)
     except Exception as e:
-        return jsonify({"error": str(e)}), 400
+        return _jsonify({"error": str(e)}), 400
 
 
 @app.route('/segments', methods=['GET'])
 def list_segments():
     """List all available segments."""
-    return jsonify({
-        "segments": pipeline.segment_names,
-        "count": len(pipeline.segment_names)
-    })
+    return _cached_response(pipeline._segments_json)
 
 
 def initialize_app():
@@ -366,4 +952,8 @@ def initialize_app():
 
 if __name__ == "__main__":
     initialize_app()
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    if _HAS_WAITRESS:
+        # Multi-threaded server so concurrent /predict calls can be batched
+        serve(app, host='0.0.0.0', port=5000, threads=8)
+    else:
+        app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
@@ -9,8 +9,73 @@ from sklearn.metrics import (
     silhouette_score, silhouette_samples,
     calinski_harabasz_score, davies_bouldin_score
 )
-import matplotlib.pyplot as plt
-import matplotlib.cm as cm
+from sklearn.metrics.pairwise import pairwise_distances_chunked
+from joblib import Parallel, delayed, effective_n_jobs
+# matplotlib is imported inside the plotting methods so that metric-only
+# users (e.g. the API workers) never load it
+
+
+def _label_counts(labels):
+    """
+    Sorted unique labels and their counts, in O(n) via bincount.
+    
+    Labels are cluster ids >= 0, plus -1 for noise.
+    """
+    labels = np.asarray(labels).astype(np.intp, copy=False)
+    counts = np.bincount(labels + 1)
+    unique = np.flatnonzero(counts)
+    return unique - 1, counts[unique]
+
+
+# Below this many points joblib overhead outweighs the parallel speedup
+_PARALLEL_SILHOUETTE_MIN_SAMPLES = 2000
+
+
+def _silhouette_rows(X_rows, X, onehot, codes_rows, counts):
+    """Silhouette values for X_rows against all of X (labels one-hot encoded)."""
+    # Sum of distances from each row to every cluster, built chunk by chunk
+    cluster_sums = np.concatenate([
+        D_chunk @ onehot for D_chunk in pairwise_distances_chunked(X_rows, X)
+    ])
+    
+    rows = np.arange(len(X_rows))
+    own_counts = counts[codes_rows]
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        a = cluster_sums[rows, codes_rows] / (own_counts - 1)
+        mean_dists = cluster_sums / counts
+        mean_dists[rows, codes_rows] = np.inf
+        b = mean_dists.min(axis=1)
+        sil = (b - a) / np.maximum(a, b)
+    
+    # Singleton clusters score 0, as in sklearn
+    sil[own_counts == 1] = 0.0
+    return np.nan_to_num(sil)
+
+
+def _parallel_silhouette_samples(X, labels, n_jobs=-1):
+    """
+    silhouette_samples split across threads by row blocks.
+    
+    Each worker computes distances from its rows to all points in
+    memory-bounded chunks; BLAS releases the GIL, so threads scale.
+    """
+    n_jobs = effective_n_jobs(n_jobs)
+    if n_jobs == 1 or len(X) < _PARALLEL_SILHOUETTE_MIN_SAMPLES:
+        return silhouette_samples(X, labels)
+    
+    X = np.asarray(X)
+    _, codes = np.unique(labels, return_inverse=True)
+    counts = np.bincount(codes)
+    onehot = np.zeros((len(X), len(counts)), dtype=X.dtype)
+    onehot[np.arange(len(X)), codes] = 1
+    
+    blocks = np.array_split(np.arange(len(X)), n_jobs)
+    results = Parallel(n_jobs=n_jobs, prefer='threads')(
+        delayed(_silhouette_rows)(X[rows], X, onehot, codes[rows], counts)
+        for rows in blocks
+    )
+    return np.concatenate(results)
 
 
 class ClusterEvaluator:
@@ -20,7 +85,7 @@ class ClusterEvaluator:
         """Initialize evaluator."""
         self.metrics = {}
     
-    def evaluate_clustering(self, X, labels, algorithm_name='Clustering'):
+    def evaluate_clustering(self, X, labels, algorithm_name='Clustering', sample_size=None):
         """
         Comprehensive clustering evaluation.
         
@@ -32,6 +97,9 @@ class ClusterEvaluator:
             Cluster labels
         algorithm_name : str
             Name of the algorithm
+        sample_size : int
+            Estimate the silhouette score on a random sample of this many
+            points (None = use all points; silhouette is O(n^2))
             
         Returns:
         --------
@@ -47,7 +115,8 @@ class ClusterEvaluator:
         X_filtered = X[mask]
         labels_filtered = labels[mask]
         
-        n_clusters = len(set(labels_filtered))
+        unique, counts = _label_counts(labels_filtered)
+        n_clusters = len(unique)
         n_noise = np.sum(~mask)
         
         print(f"Number of clusters: {n_clusters}")
@@ -63,7 +132,11 @@ class ClusterEvaluator:
         # Calculate metrics only if we have valid clusters
         if n_clusters > 1 and len(X_filtered) > n_clusters:
             # Silhouette Score
-            silhouette_avg = silhouette_score(X_filtered, labels_filtered)
+            if sample_size is not None and len(X_filtered) > sample_size:
+                silhouette_avg = silhouette_score(X_filtered, labels_filtered,
+                                                  sample_size=sample_size, random_state=0)
+            else:
+                silhouette_avg = silhouette_score(X_filtered, labels_filtered)
             metrics['silhouette_score'] = silhouette_avg
             print(f"Silhouette Score: {silhouette_avg:.4f}")
             print(self._interpret_silhouette(silhouette_avg))
@@ -81,7 +154,6 @@ class ClusterEvaluator:
             print("  (Lower is better - measures cluster similarity)")
             
             # Cluster size distribution
-            unique, counts = np.unique(labels_filtered, return_counts=True)
             cluster_sizes = dict(zip(unique, counts))
             metrics['cluster_sizes'] = cluster_sizes
             
@@ -122,7 +194,7 @@ class ClusterEvaluator:
         else:
             return "  (Poor - No substantial cluster structure)"
     
-    def plot_silhouette_analysis(self, X, labels, n_clusters, save_path=None):
+    def plot_silhouette_analysis(self, X, labels, n_clusters, save_path=None, sample_size=None, show=True):
         """
         Create silhouette plot for cluster analysis.
         
@@ -136,7 +208,16 @@ class ClusterEvaluator:
             Number of clusters
         save_path : str
             Path to save figure
+        sample_size : int
+            Plot silhouettes for a random sample of this many points
+            (None = all points)
+        show : bool
+            Display the figure; with show=False it is only saved (if
+            save_path is given) and then closed
         """
+        import matplotlib.pyplot as plt
+        import matplotlib.cm as cm
+        
         # Filter noise points
         mask = labels != -1
         X_filtered = X[mask]
@@ -146,18 +227,28 @@ class ClusterEvaluator:
             print("Cannot create silhouette plot with less than 2 clusters")
             return
         
+        if sample_size is not None and len(X_filtered) > sample_size:
+            idx = np.random.default_rng(0).choice(len(X_filtered), sample_size, replace=False)
+            X_filtered = X_filtered[idx]
+            labels_filtered = labels_filtered[idx]
+        
         fig, ax = plt.subplots(1, 1, figsize=(10, 7))
         
-        # Compute silhouette scores
-        silhouette_avg = silhouette_score(X_filtered, labels_filtered)
-        sample_silhouette_values = silhouette_samples(X_filtered, labels_filtered)
+        # Compute silhouette scores; the average is just their mean
+        sample_silhouette_values = _parallel_silhouette_samples(X_filtered, labels_filtered)
+        silhouette_avg = sample_silhouette_values.mean()
+        
+        # One sort by (cluster, silhouette) puts each cluster's values in a
+        # contiguous, already-sorted run
+        order = np.lexsort((sample_silhouette_values, labels_filtered))
+        sorted_values = sample_silhouette_values[order]
+        cuts = np.searchsorted(labels_filtered[order], np.arange(n_clusters + 1))
         
         y_lower = 10
         
         for i in range(n_clusters):
-            # Aggregate silhouette scores for samples in cluster i
-            ith_cluster_silhouette_values = sample_silhouette_values[labels_filtered == i]
-            ith_cluster_silhouette_values.sort()
+            # Silhouette scores for samples in cluster i
+            ith_cluster_silhouette_values = sorted_values[cuts[i]:cuts[i + 1]]
             
             size_cluster_i = ith_cluster_silhouette_values.shape[0]
             y_upper = y_lower + size_cluster_i
@@ -190,11 +281,14 @@ class ClusterEvaluator:
         ax.set_xlim([-0.1, 1])
         
         if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
+            fig.savefig(save_path, dpi=300, bbox_inches='tight')
             print(f"Silhouette plot saved to {save_path}")
         
         plt.tight_layout()
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close(fig)
     
     def compare_algorithms(self, metrics_list=None):
         """
@@ -244,7 +338,7 @@ class ClusterEvaluator:
         
         return comparison_df
     
-    def plot_metrics_comparison(self, comparison_df=None, save_path=None):
+    def plot_metrics_comparison(self, comparison_df=None, save_path=None, show=True):
         """
         Visualize comparison of metrics across algorithms.
         
@@ -254,7 +348,12 @@ class ClusterEvaluator:
             Comparison dataframe (optional)
         save_path : str
             Path to save figure
+        show : bool
+            Display the figure; with show=False it is only saved (if
+            save_path is given) and then closed
         """
+        import matplotlib.pyplot as plt
+        
         if comparison_df is None:
             comparison_df = self.compare_algorithms()
         
@@ -287,13 +386,16 @@ class ClusterEvaluator:
                       fontsize=14, fontweight='bold', y=1.02)
         
         if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
+            fig.savefig(save_path, dpi=300, bbox_inches='tight')
             print(f"Comparison plot saved to {save_path}")
         
         plt.tight_layout()
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close(fig)
     
-    def plot_cluster_distribution(self, labels, algorithm_name='Clustering', save_path=None):
+    def plot_cluster_distribution(self, labels, algorithm_name='Clustering', save_path=None, show=True):
         """
         Plot cluster size distribution.
         
@@ -305,8 +407,14 @@ class ClusterEvaluator:
             Name of algorithm
         save_path : str
             Path to save figure
+        show : bool
+            Display the figure; with show=False it is only saved (if
+            save_path is given) and then closed
         """
-        unique, counts = np.unique(labels, return_counts=True)
+        import matplotlib.pyplot as plt
+        import matplotlib.cm as cm
+        
+        unique, counts = _label_counts(labels)
         
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
         
@@ -330,11 +438,14 @@ class ClusterEvaluator:
         ax2.set_title(f'Cluster Proportion - {algorithm_name}', fontweight='bold')
         
         if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
+            fig.savefig(save_path, dpi=300, bbox_inches='tight')
             print(f"Cluster distribution plot saved to {save_path}")
         
         plt.tight_layout()
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close(fig)
     
     def calculate_cluster_stats(self, df, labels, label_column='Cluster'):
         """
@@ -354,16 +465,54 @@ class ClusterEvaluator:
         pd.DataFrame
             Statistics per cluster
         """
-        df_copy = df.copy()
-        df_copy[label_column] = labels
+        labels = np.asarray(labels)
         
         # Get numeric columns only
-        numeric_cols = df_copy.select_dtypes(include=[np.number]).columns.tolist()
+        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
         if label_column in numeric_cols:
             numeric_cols.remove(label_column)
         
-        # Calculate stats for each cluster
-        cluster_stats = df_copy.groupby(label_column)[numeric_cols].agg(['mean', 'median', 'std'])
+        # Sort rows by cluster once; each cluster is then a contiguous slice
+        order = np.argsort(labels, kind='stable')
+        sorted_labels = labels[order]
+        arr = df[numeric_cols].to_numpy(dtype=np.float64, na_value=np.nan)[order]
+        
+        clusters, starts, sizes = np.unique(sorted_labels, return_index=True, return_counts=True)
+        
+        # NaNs are skipped, as in pandas
+        valid = ~np.isnan(arr)
+        counts = np.add.reduceat(valid, starts, axis=0)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.add.reduceat(np.where(valid, arr, 0.0), starts, axis=0) / counts
+            
+            dev = np.where(valid, arr - np.repeat(means, sizes, axis=0), 0.0)
+            m2 = np.add.reduceat(dev * dev, starts, axis=0)
+            stds = np.sqrt(m2 / (counts - 1))
+        stds[counts < 2] = np.nan
+        
+        # Medians by selection rather than sorting; NaNs partition to the
+        # end, so each column's median sits at its own valid-count midpoint
+        medians = np.full_like(means, np.nan)
+        feature_idx = np.arange(arr.shape[1])
+        for i, (start, size) in enumerate(zip(starts, sizes)):
+            n_valid = counts[i]
+            lo = (n_valid - 1) // 2
+            hi = n_valid // 2
+            kth = np.unique(np.concatenate([lo, hi]))
+            kth = kth[kth >= 0]
+            if len(kth) == 0:
+                continue
+            
+            part = np.partition(arr[start:start + size], kth, axis=0)
+            has_values = n_valid > 0
+            medians[i, has_values] = 0.5 * (part[lo, feature_idx] + part[hi, feature_idx])[has_values]
+        
+        # Same layout as groupby().agg(['mean', 'median', 'std'])
+        stats = np.stack([means, medians, stds], axis=2).reshape(len(clusters), -1)
+        columns = pd.MultiIndex.from_product([numeric_cols, ['mean', 'median', 'std']])
+        cluster_stats = pd.DataFrame(stats, index=pd.Index(clusters, name=label_column),
+                                     columns=columns)
         
         return cluster_stats
 
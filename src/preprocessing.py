@@ -5,13 +5,130 @@ Handles missing values, outliers, feature engineering, encoding, and scaling.
 
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler, MinMaxScaler, RobustScaler, LabelEncoder
+from sklearn.preprocessing import StandardScaler, MinMaxScaler, RobustScaler
 from sklearn.impute import SimpleImputer, KNNImputer
-from sklearn.decomposition import PCA
+from sklearn.decomposition import PCA, IncrementalPCA, TruncatedSVD
+from scipy import sparse
+from numba import njit, prange
 import joblib
+from joblib import Parallel, delayed, effective_n_jobs
 import warnings
 warnings.filterwarnings('ignore')
 
+# Auto component selection estimates the variance curve from at most this
+# many leading components when there are more features than that
+_PCA_AUTO_MAX_COMPONENTS = 50
+
+# Below this many rows joblib overhead outweighs the parallel KNN speedup
+_PARALLEL_KNN_MIN_SAMPLES = 5000
+
+# select_dtypes filters used by the preprocessing stages
+_DTYPE_GROUPS = {
+    'numeric': [np.number],
+    'object': ['object'],
+    'categorical': ['object', 'category'],
+}
+
+
+def _parallel_knn_impute(imputer, X, n_jobs=-1):
+    """
+    KNNImputer.fit_transform with the transform split across threads.
+    
+    Each row block is imputed independently against the full fitted data,
+    so the result is identical to the serial call; the distance GEMMs
+    release the GIL, so threads scale.
+    """
+    n_jobs = effective_n_jobs(n_jobs)
+    if n_jobs == 1 or len(X) < _PARALLEL_KNN_MIN_SAMPLES:
+        return imputer.fit_transform(X)
+    
+    imputer.fit(X)
+    blocks = np.array_split(np.arange(len(X)), n_jobs * 4)
+    results = Parallel(n_jobs=n_jobs, prefer='threads')(
+        delayed(imputer.transform)(X.iloc[rows]) for rows in blocks
+    )
+    return np.vstack(results)
+
+
+def _randomized_pca(n_components):
+    """Truncated PCA via randomized SVD, O(n*d*k) instead of a full SVD."""
+    return PCA(n_components=n_components, svd_solver='randomized', random_state=0,
+               n_oversamples=10, iterated_power=2)
+
+
+_EMPTY = np.empty(0)
+
+
+# No fastmath: inputs may hold NaN (feature_engineering on raw data), which
+# must propagate as it does in pandas
+@njit(parallel=True, cache=True)
+def _engineer_ratios(freq, visits, email, tenure, returns, v_min, v_range, f_min, f_range,
+                     engagement, avg_days, return_rate):
+    """
+    Fill EngagementScore, AvgDaysBetweenPurchase and ReturnRate in one pass.
+    
+    Outputs (and the inputs only they need) that are not being built are
+    passed as empty arrays and skipped.
+    """
+    n = len(freq)
+    build_engagement = len(engagement) == n
+    build_avg_days = len(avg_days) == n
+    build_return_rate = len(return_rate) == n
+    
+    for i in prange(n):
+        f = freq[i]
+        if build_engagement:
+            engagement[i] = (0.3 * (visits[i] - v_min) / v_range + 0.3 * email[i]
+                             + 0.4 * (f - f_min) / f_range)
+        if build_avg_days:
+            avg_days[i] = tenure[i] / (f + 1.0)
+        if build_return_rate:
+            return_rate[i] = returns[i] / (f + 1.0)
+
+
+def _quantile_scores(values, q=5, reverse=False):
+    """
+    Integer quantile scores 1..q as int8, like pd.qcut with labels 1..q.
+    
+    Bins are right-closed with the lowest edge included; reverse=True
+    gives q to the lowest bin instead.
+    """
+    edges = np.quantile(values, np.linspace(0, 1, q + 1))
+    # Number of inner edges strictly below each value = its 0-based bin
+    bins = np.searchsorted(edges[1:-1], values, side='left').astype(np.int8)
+    return np.int8(q) - bins if reverse else bins + np.int8(1)
+
+
+def _cut_categorical(values, bins, labels):
+    """
+    Ordered Categorical like pd.cut(values, bins, labels=labels).
+    
+    Bins are right-closed; values outside (bins[0], bins[-1]] or NaN
+    get a missing code. Codes are built branchlessly by summing one
+    comparison per inner edge, which is cheaper than a binary search for
+    the handful of bins used here.
+    """
+    values = np.asarray(values)
+    codes = np.zeros(len(values), dtype=np.int8)
+    for edge in bins[1:-1]:
+        codes += values > edge
+    # NaN fails both comparisons and lands here too
+    in_range = (values > bins[0]) & (values <= bins[-1])
+    codes[~in_range] = -1
+    return pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+
+
+def _truncate_pca(pca, n_components):
+    """Keep only the first n_components of an already fitted PCA model."""
+    dropped = pca.explained_variance_[n_components:]
+    pca.components_ = pca.components_[:n_components].copy()
+    pca.explained_variance_ = pca.explained_variance_[:n_components].copy()
+    pca.explained_variance_ratio_ = pca.explained_variance_ratio_[:n_components].copy()
+    pca.singular_values_ = pca.singular_values_[:n_components].copy()
+    pca.noise_variance_ = dropped.mean() if len(dropped) else 0.0
+    pca.n_components = pca.n_components_ = n_components
+    return pca
+
 
 class DataPreprocessor:
     """Comprehensive data preprocessing pipeline."""
@@ -25,9 +142,42 @@ class DataPreprocessor:
         self.feature_names = None
         self.numeric_features = None
         self.categorical_features = None
+        self._cached_frame = None
+        self._cached_columns = {}
+        self._id_cols = None
+    
+    def _id_columns(self, df):
+        """
+        ID columns to leave untouched.
+        
+        Inside the pipeline this is the set detected once on the input
+        frame; standalone calls detect ID columns by name on df.
+        """
+        if self._id_cols is not None:
+            return self._id_cols
+        return {col for col in df.columns if 'id' in col.lower()}
+    
+    def _refresh_column_cache(self, df):
+        """
+        Record df's column lists per dtype group for the following stages.
+        
+        The pipeline calls this after every step that changes the schema;
+        stages then skip select_dtypes while they see the same frame.
+        """
+        self._cached_frame = df
+        self._cached_columns = {kind: df.select_dtypes(include=include).columns.tolist()
+                                for kind, include in _DTYPE_GROUPS.items()}
+        self.numeric_features = self._cached_columns['numeric']
+        self.categorical_features = self._cached_columns['categorical']
+    
+    def _columns_of(self, df, kind):
+        """Columns of df in a dtype group from _DTYPE_GROUPS."""
+        if df is self._cached_frame:
+            return list(self._cached_columns[kind])
+        return df.select_dtypes(include=_DTYPE_GROUPS[kind]).columns.tolist()
     
     def handle_missing_values(self, df, strategy='auto', numeric_strategy='median', 
-                               categorical_strategy='most_frequent'):
+                               categorical_strategy='most_frequent', inplace=False, verbose=True):
         """
         Handle missing values in the dataset.
         
@@ -41,6 +191,10 @@ class DataPreprocessor:
             'mean', 'median', 'knn'
         categorical_strategy : str
             'most_frequent', 'constant'
+        inplace : bool
+            If True, modify df in place instead of working on a copy
+        verbose : bool
+            Whether to report the remaining missing values (a full scan)
             
         Returns:
         --------
@@ -48,15 +202,16 @@ class DataPreprocessor:
             Dataframe with handled missing values
         """
         print("Handling missing values...")
-        df_copy = df.copy()
+        df_copy = df if inplace else df.copy()
         
         # Get numeric and categorical columns
-        numeric_cols = df_copy.select_dtypes(include=[np.number]).columns.tolist()
-        categorical_cols = df_copy.select_dtypes(include=['object']).columns.tolist()
+        numeric_cols = self._columns_of(df_copy, 'numeric')
+        categorical_cols = self._columns_of(df_copy, 'object')
         
         # Remove ID columns from processing
-        numeric_cols = [col for col in numeric_cols if 'ID' not in col.upper()]
-        categorical_cols = [col for col in categorical_cols if 'ID' not in col.upper()]
+        id_cols = self._id_columns(df_copy)
+        numeric_cols = [col for col in numeric_cols if col not in id_cols]
+        categorical_cols = [col for col in categorical_cols if col not in id_cols]
         
         if strategy == 'auto':
             # Drop columns with >40% missing
@@ -65,7 +220,7 @@ class DataPreprocessor:
             
             if cols_to_drop:
                 print(f"Dropping columns with >40% missing: {cols_to_drop}")
-                df_copy = df_copy.drop(columns=cols_to_drop)
+                df_copy.drop(columns=cols_to_drop, inplace=True)
                 numeric_cols = [col for col in numeric_cols if col not in cols_to_drop]
                 categorical_cols = [col for col in categorical_cols if col not in cols_to_drop]
         
@@ -74,11 +229,12 @@ class DataPreprocessor:
             if numeric_strategy == 'knn':
                 imputer = KNNImputer(n_neighbors=5)
                 self.imputers['numeric'] = imputer
+                df_copy[numeric_cols] = _parallel_knn_impute(imputer, df_copy[numeric_cols])
             else:
                 imputer = SimpleImputer(strategy=numeric_strategy)
                 self.imputers['numeric'] = imputer
+                df_copy[numeric_cols] = imputer.fit_transform(df_copy[numeric_cols])
             
-            df_copy[numeric_cols] = imputer.fit_transform(df_copy[numeric_cols])
             print(f"Imputed {len(numeric_cols)} numeric features using {numeric_strategy}")
         
         # Impute categorical features
@@ -88,7 +244,8 @@ class DataPreprocessor:
             df_copy[categorical_cols] = imputer.fit_transform(df_copy[categorical_cols])
             print(f"Imputed {len(categorical_cols)} categorical features using {categorical_strategy}")
         
-        print(f"Remaining missing values: {df_copy.isnull().sum().sum()}")
+        if verbose:
+            print(f"Remaining missing values: {df_copy.isnull().sum().sum()}")
         
         return df_copy
     
@@ -113,34 +270,42 @@ class DataPreprocessor:
             Dictionary with outlier information per column
         """
         if columns is None:
-            columns = df.select_dtypes(include=[np.number]).columns.tolist()
-            columns = [col for col in columns if 'ID' not in col.upper()]
+            id_cols = self._id_columns(df)
+            columns = [col for col in self._columns_of(df, 'numeric') if col not in id_cols]
         
         outliers_info = {}
         
-        for col in columns:
+        # One pass over the numeric block for all columns; NaNs are
+        # ignored by the statistics and never flagged
+        X = df[columns].to_numpy(dtype=np.float64)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
             if method == 'iqr':
-                Q1 = df[col].quantile(0.25)
-                Q3 = df[col].quantile(0.75)
+                Q1, Q3 = np.nanpercentile(X, [25, 75], axis=0)
                 IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                outliers = df[(df[col] < lower_bound) | (df[col] > upper_bound)]
+                lower_bounds = Q1 - 1.5 * IQR
+                upper_bounds = Q3 + 1.5 * IQR
+                mask = (X < lower_bounds) | (X > upper_bounds)
             
             elif method == 'zscore':
-                z_scores = np.abs((df[col] - df[col].mean()) / df[col].std())
-                outliers = df[z_scores > threshold]
-            
-            if len(outliers) > 0:
-                outliers_info[col] = {
-                    'count': len(outliers),
-                    'percentage': (len(outliers) / len(df)) * 100,
-                    'indices': outliers.index.tolist()
-                }
+                z_scores = np.abs((X - np.nanmean(X, axis=0)) / np.nanstd(X, axis=0, ddof=1))
+                mask = z_scores > threshold
+        
+        counts = mask.sum(axis=0)
+        for j in np.flatnonzero(counts):
+            outliers_info[columns[j]] = {
+                'count': int(counts[j]),
+                'percentage': (counts[j] / len(df)) * 100,
+                'indices': df.index[np.flatnonzero(mask[:, j])].tolist()
+            }
+            if method == 'iqr':
+                # Kept so handle_outliers can cap without recomputing quartiles
+                outliers_info[columns[j]]['lower'] = lower_bounds[j]
+                outliers_info[columns[j]]['upper'] = upper_bounds[j]
         
         return outliers_info
     
-    def handle_outliers(self, df, method='cap', outlier_info=None):
+    def handle_outliers(self, df, method='cap', outlier_info=None, inplace=False):
         """
         Handle outliers using capping or removal.
         
@@ -152,13 +317,15 @@ class DataPreprocessor:
             'cap', 'remove', 'none'
         outlier_info : dict
             Output from detect_outliers()
+        inplace : bool
+            If True, modify df in place instead of working on a copy
             
         Returns:
         --------
         pd.DataFrame
             Dataframe with handled outliers
         """
-        df_copy = df.copy()
+        df_copy = df if inplace else df.copy()
         
         if method == 'none':
             return df_copy
@@ -167,14 +334,22 @@ class DataPreprocessor:
             outlier_info = self.detect_outliers(df_copy)
         
         if method == 'cap':
-            for col in outlier_info.keys():
-                Q1 = df_copy[col].quantile(0.25)
-                Q3 = df_copy[col].quantile(0.75)
+            cols = list(outlier_info.keys())
+            
+            if all('lower' in outlier_info[col] for col in cols):
+                # IQR bounds already computed by detect_outliers
+                lower_bounds = pd.Series({col: outlier_info[col]['lower'] for col in cols}, dtype=float)
+                upper_bounds = pd.Series({col: outlier_info[col]['upper'] for col in cols}, dtype=float)
+            else:
+                Q1 = df_copy[cols].quantile(0.25)
+                Q3 = df_copy[cols].quantile(0.75)
                 IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                
-                df_copy[col] = df_copy[col].clip(lower=lower_bound, upper=upper_bound)
+                lower_bounds = Q1 - 1.5 * IQR
+                upper_bounds = Q3 + 1.5 * IQR
+            
+            if cols:
+                df_copy[cols] = df_copy[cols].clip(lower=lower_bounds, upper=upper_bounds, axis=1)
+            for col in cols:
                 print(f"Capped outliers in {col}")
         
         elif method == 'remove':
@@ -182,12 +357,12 @@ class DataPreprocessor:
             for info in outlier_info.values():
                 all_outlier_indices.update(info['indices'])
             
-            df_copy = df_copy.drop(index=list(all_outlier_indices))
+            df_copy.drop(index=list(all_outlier_indices), inplace=True)
             print(f"Removed {len(all_outlier_indices)} outlier rows")
         
         return df_copy
     
-    def feature_engineering(self, df):
+    def feature_engineering(self, df, inplace=False):
         """
         Create new features from existing ones.
         
@@ -195,6 +370,8 @@ class DataPreprocessor:
         -----------
         df : pd.DataFrame
             Input dataframe
+        inplace : bool
+            If True, modify df in place instead of working on a copy
             
         Returns:
         --------
@@ -202,72 +379,106 @@ class DataPreprocessor:
             Dataframe with engineered features
         """
         print("Engineering new features...")
-        df_copy = df.copy()
+        # Derived columns are collected here and attached in one go rather
+        # than inserted into the frame one at a time
+        new_cols = {}
         
         # RFM Score (if RFM columns exist)
-        if all(col in df_copy.columns for col in ['Recency', 'Frequency', 'Monetary']):
-            # Normalize RFM values to 1-5 scale
-            df_copy['R_Score'] = pd.qcut(df_copy['Recency'], q=5, labels=[5, 4, 3, 2, 1], duplicates='drop')
-            df_copy['F_Score'] = pd.qcut(df_copy['Frequency'], q=5, labels=[1, 2, 3, 4, 5], duplicates='drop')
-            df_copy['M_Score'] = pd.qcut(df_copy['Monetary'], q=5, labels=[1, 2, 3, 4, 5], duplicates='drop')
-            
-            # Convert to numeric
-            df_copy['R_Score'] = df_copy['R_Score'].astype(int)
-            df_copy['F_Score'] = df_copy['F_Score'].astype(int)
-            df_copy['M_Score'] = df_copy['M_Score'].astype(int)
+        if all(col in df.columns for col in ['Recency', 'Frequency', 'Monetary']):
+            # Normalize RFM values to 1-5 scale (lower recency scores higher)
+            r_score = _quantile_scores(df['Recency'].to_numpy(), reverse=True)
+            f_score = _quantile_scores(df['Frequency'].to_numpy())
+            m_score = _quantile_scores(df['Monetary'].to_numpy())
+            new_cols['R_Score'] = r_score
+            new_cols['F_Score'] = f_score
+            new_cols['M_Score'] = m_score
             
-            # Combined RFM Score
-            df_copy['RFM_Score'] = (df_copy['R_Score'] + df_copy['F_Score'] + df_copy['M_Score']) / 3
+            # Combined RFM Score, accumulated in a single float buffer
+            rfm = np.add(r_score, f_score, dtype=np.float64)
+            rfm += m_score
+            rfm /= 3
+            new_cols['RFM_Score'] = rfm
             print("Created RFM scores")
         
         # Customer Value Tier
-        if 'Monetary' in df_copy.columns:
-            df_copy['ValueTier'] = pd.cut(df_copy['Monetary'],
-                                           bins=[0, 1000, 3000, 7000, np.inf],
-                                           labels=['Low', 'Medium', 'High', 'Premium'])
+        if 'Monetary' in df.columns:
+            new_cols['ValueTier'] = _cut_categorical(df['Monetary'].to_numpy(),
+                                                     bins=[0, 1000, 3000, 7000, np.inf],
+                                                     labels=['Low', 'Medium', 'High', 'Premium'])
             print("Created ValueTier feature")
         
-        # Engagement Score
-        if all(col in df_copy.columns for col in ['WebsiteVisits', 'EmailOpenRate', 'Frequency']):
-            # Normalize components
-            visits_norm = (df_copy['WebsiteVisits'] - df_copy['WebsiteVisits'].min()) / \
-                          (df_copy['WebsiteVisits'].max() - df_copy['WebsiteVisits'].min())
-            email_norm = df_copy['EmailOpenRate']
-            freq_norm = (df_copy['Frequency'] - df_copy['Frequency'].min()) / \
-                        (df_copy['Frequency'].max() - df_copy['Frequency'].min())
+        # Engagement score and the per-purchase ratios share Frequency, so
+        # one fused kernel pass fills all three
+        build_engagement = all(col in df.columns for col in ['WebsiteVisits', 'EmailOpenRate', 'Frequency'])
+        build_avg_days = all(col in df.columns for col in ['TenureDays', 'Frequency'])
+        build_return_rate = all(col in df.columns for col in ['NumReturns', 'Frequency'])
+        
+        if build_engagement or build_avg_days or build_return_rate:
+            inputs = {}
+            for col, needed in [('Frequency', True),
+                                ('WebsiteVisits', build_engagement),
+                                ('EmailOpenRate', build_engagement),
+                                ('TenureDays', build_avg_days),
+                                ('NumReturns', build_return_rate)]:
+                inputs[col] = df[col].to_numpy(dtype=np.float64) if needed else _EMPTY
+            freq, visits = inputs['Frequency'], inputs['WebsiteVisits']
+            email, tenure, returns = inputs['EmailOpenRate'], inputs['TenureDays'], inputs['NumReturns']
+            
+            v_min, v_max = (np.nanmin(visits), np.nanmax(visits)) if build_engagement else (0.0, 1.0)
+            f_min, f_max = np.nanmin(freq), np.nanmax(freq)
             
-            df_copy['EngagementScore'] = (visits_norm * 0.3 + email_norm * 0.3 + freq_norm * 0.4)
+            n = len(freq)
+            engagement = np.empty(n if build_engagement else 0)
+            avg_days = np.empty(n if build_avg_days else 0)
+            return_rate = np.empty(n if build_return_rate else 0)
+            _engineer_ratios(freq, visits, email, tenure, returns,
+                             v_min, v_max - v_min, f_min, f_max - f_min,
+                             engagement, avg_days, return_rate)
+        
+        # Engagement Score
+        if build_engagement:
+            new_cols['EngagementScore'] = engagement
             print("Created EngagementScore")
         
         # Average days between purchases
-        if all(col in df_copy.columns for col in ['TenureDays', 'Frequency']):
-            df_copy['AvgDaysBetweenPurchase'] = df_copy['TenureDays'] / (df_copy['Frequency'] + 1)
+        if build_avg_days:
+            new_cols['AvgDaysBetweenPurchase'] = avg_days
             print("Created AvgDaysBetweenPurchase")
         
         # Discount affinity
-        if 'DiscountUsage' in df_copy.columns:
-            df_copy['DiscountAffinity'] = pd.cut(df_copy['DiscountUsage'],
-                                                   bins=[0, 0.2, 0.5, 1.0],
-                                                   labels=['Low', 'Medium', 'High'])
+        if 'DiscountUsage' in df.columns:
+            new_cols['DiscountAffinity'] = _cut_categorical(df['DiscountUsage'].to_numpy(),
+                                                            bins=[0, 0.2, 0.5, 1.0],
+                                                            labels=['Low', 'Medium', 'High'])
             print("Created DiscountAffinity")
         
         # Return rate
-        if all(col in df_copy.columns for col in ['NumReturns', 'Frequency']):
-            df_copy['ReturnRate'] = df_copy['NumReturns'] / (df_copy['Frequency'] + 1)
+        if build_return_rate:
+            new_cols['ReturnRate'] = return_rate
             print("Created ReturnRate")
         
         # Customer lifecycle stage
-        if 'TenureDays' in df_copy.columns:
-            df_copy['LifecycleStage'] = pd.cut(df_copy['TenureDays'],
-                                                bins=[0, 90, 365, 730, np.inf],
-                                                labels=['New', 'Growing', 'Mature', 'Veteran'])
+        if 'TenureDays' in df.columns:
+            new_cols['LifecycleStage'] = _cut_categorical(df['TenureDays'].to_numpy(),
+                                                          bins=[0, 90, 365, 730, np.inf],
+                                                          labels=['New', 'Growing', 'Mature', 'Veteran'])
             print("Created LifecycleStage")
         
+        overlap = any(col in df.columns for col in new_cols)
+        if inplace or overlap:
+            # Re-engineering an already engineered frame overwrites columns
+            df_copy = df if inplace else df.copy()
+            for col, values in new_cols.items():
+                df_copy[col] = values
+        else:
+            df_copy = pd.concat([df, pd.DataFrame(new_cols, index=df.index)], axis=1)
+        
         print(f"Total features after engineering: {len(df_copy.columns)}")
         
         return df_copy
     
-    def encode_categorical(self, df, encoding_method='onehot', exclude_columns=None):
+    def encode_categorical(self, df, encoding_method='onehot', exclude_columns=None, inplace=False,
+                           sparse=False):
         """
         Encode categorical variables.
         
@@ -279,6 +490,11 @@ class DataPreprocessor:
             'onehot' or 'label'
         exclude_columns : list
             Columns to exclude from encoding
+        inplace : bool
+            If True, modify df in place instead of working on a copy
+        sparse : bool
+            If True, store one-hot columns as pandas sparse columns, which
+            scale_features leaves unscaled and apply_pca reduces with TruncatedSVD
             
         Returns:
         --------
@@ -286,33 +502,39 @@ class DataPreprocessor:
             Dataframe with encoded features
         """
         print(f"Encoding categorical variables using {encoding_method}...")
-        df_copy = df.copy()
+        df_copy = df if inplace else df.copy()
         
         if exclude_columns is None:
             exclude_columns = []
         
         # Get categorical columns
-        cat_cols = df_copy.select_dtypes(include=['object', 'category']).columns.tolist()
-        cat_cols = [col for col in cat_cols if col not in exclude_columns and 'ID' not in col.upper()]
+        cat_cols = self._columns_of(df_copy, 'categorical')
+        id_cols = self._id_columns(df_copy)
+        cat_cols = [col for col in cat_cols if col not in exclude_columns and col not in id_cols]
         
         if encoding_method == 'onehot':
             # One-hot encoding
-            df_copy = pd.get_dummies(df_copy, columns=cat_cols, drop_first=True, dtype=int)
+            # uint8 indicators take an eighth of the memory of int64 ones
+            df_copy = pd.get_dummies(df_copy, columns=cat_cols, drop_first=True, dtype=np.uint8,
+                                     sparse=sparse)
             print(f"One-hot encoded {len(cat_cols)} categorical features")
         
         elif encoding_method == 'label':
             # Label encoding
+            # Sorted factorize gives the same codes as LabelEncoder in one
+            # hashtable pass; the sorted uniques play the role of classes_
             for col in cat_cols:
-                le = LabelEncoder()
-                df_copy[col] = le.fit_transform(df_copy[col].astype(str))
-                self.label_encoders[col] = le
+                codes, uniques = pd.factorize(df_copy[col].astype(str), sort=True)
+                df_copy[col] = codes.astype(np.int32)
+                self.label_encoders[col] = uniques
             print(f"Label encoded {len(cat_cols)} categorical features")
         
         print(f"Total features after encoding: {len(df_copy.columns)}")
         
         return df_copy
     
-    def scale_features(self, df, method='standard', exclude_columns=None):
+    def scale_features(self, df, method='standard', exclude_columns=None, inplace=False,
+                       dtype=None):
         """
         Scale numerical features.
         
@@ -324,21 +546,39 @@ class DataPreprocessor:
             'standard', 'minmax', or 'robust'
         exclude_columns : list
             Columns to exclude from scaling
+        inplace : bool
+            If True, modify df in place instead of working on a copy
+        dtype : numpy dtype
+            If given (e.g. np.float32), cast the scaled columns to it before
+            fitting; scalers and PCA keep float32 input in float32
             
         Returns:
         --------
         pd.DataFrame, scaler
             Scaled dataframe and fitted scaler
         """
+        df_copy, _, _ = self._scale(df, method, exclude_columns, inplace, dtype)
+        return df_copy
+    
+    def _scale(self, df, method, exclude_columns, inplace, dtype):
+        """
+        Body of scale_features.
+        
+        Also returns the scaled block and its columns, so the pipeline can
+        hand them straight to PCA instead of extracting them again.
+        """
         print(f"Scaling features using {method} scaling...")
-        df_copy = df.copy()
+        df_copy = df if inplace else df.copy()
         
         if exclude_columns is None:
             exclude_columns = []
         
         # Get numeric columns to scale
-        numeric_cols = df_copy.select_dtypes(include=[np.number]).columns.tolist()
-        numeric_cols = [col for col in numeric_cols if col not in exclude_columns and 'ID' not in col.upper()]
+        numeric_cols = self._columns_of(df_copy, 'numeric')
+        id_cols = self._id_columns(df_copy)
+        numeric_cols = [col for col in numeric_cols if col not in exclude_columns and col not in id_cols]
+        # Sparse one-hot columns stay as they are; centering would densify them
+        numeric_cols = [col for col in numeric_cols if not isinstance(df_copy[col].dtype, pd.SparseDtype)]
         
         # Initialize scaler
         if method == 'standard':
@@ -350,15 +590,22 @@ class DataPreprocessor:
         else:
             raise ValueError(f"Unknown scaling method: {method}")
         
-        # Fit and transform
-        df_copy[numeric_cols] = self.scaler.fit_transform(df_copy[numeric_cols])
+        # Fit and transform in place on one fresh array
+        X = df_copy[numeric_cols].to_numpy(dtype=dtype, copy=True)
+        self.scaler.set_params(copy=False)
+        try:
+            X = self.scaler.fit_transform(X)
+        finally:
+            self.scaler.set_params(copy=True)
+        df_copy[numeric_cols] = X
         
         print(f"Scaled {len(numeric_cols)} numerical features")
         self.feature_names = numeric_cols
         
-        return df_copy
+        return df_copy, X, numeric_cols
     
-    def apply_pca(self, df, n_components=None, variance_threshold=0.90, exclude_columns=None):
+    def apply_pca(self, df, n_components=None, variance_threshold=0.90, exclude_columns=None,
+                  batch_size=None, dtype=None):
         """
         Apply Principal Component Analysis for dimensionality reduction.
         
@@ -372,34 +619,81 @@ class DataPreprocessor:
             Cumulative variance threshold for auto component selection
         exclude_columns : list
             Columns to exclude from PCA
+        batch_size : int
+            If given, fit an IncrementalPCA over mini-batches of this many rows
+            instead of a full PCA, keeping SVD memory at O(batch_size x features)
+        dtype : numpy dtype
+            If given (e.g. np.float32), run the decomposition in this dtype
             
         Returns:
         --------
         pd.DataFrame, explained_variance
             Transformed dataframe and explained variance ratios
         """
+        return self._apply_pca(df, n_components, variance_threshold, exclude_columns, batch_size, dtype)
+    
+    def _apply_pca(self, df, n_components, variance_threshold, exclude_columns, batch_size, dtype,
+                   scaled=None):
+        """
+        Body of apply_pca.
+        
+        scaled is an optional (array, columns) pair from _scale for this same
+        frame; when its columns match, that array is decomposed directly.
+        """
         print("Applying PCA...")
         
         if exclude_columns is None:
             exclude_columns = []
         
         # Get numeric columns
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+        numeric_cols = self._columns_of(df, 'numeric')
         numeric_cols = [col for col in numeric_cols if col not in exclude_columns]
         
-        X = df[numeric_cols].values
+        sparse_cols = [col for col in numeric_cols if isinstance(df[col].dtype, pd.SparseDtype)]
+        if sparse_cols:
+            X = self._sparse_matrix(df, numeric_cols, sparse_cols, dtype=dtype or np.float64)
+        elif scaled is not None and numeric_cols == scaled[1]:
+            X = scaled[0] if dtype is None else scaled[0].astype(dtype, copy=False)
+        else:
+            X = df[numeric_cols].to_numpy(dtype=dtype)
+        
+        # Fit once; when auto-selecting, keep the leading components of that
+        # fit instead of refitting with the chosen count
+        if sparse_cols:
+            # TruncatedSVD works on the CSR matrix directly, without centering
+            # (and so densifying) the one-hot block
+            max_components = min(X.shape[1] - 1, _PCA_AUTO_MAX_COMPONENTS)
+            self.pca = TruncatedSVD(n_components=n_components or max_components, random_state=0)
+            self.pca.fit(X)
+        elif batch_size is not None:
+            self.pca = IncrementalPCA(n_components=n_components, batch_size=batch_size)
+            self.pca.fit(X)
+        elif n_components is not None:
+            if n_components < min(X.shape):
+                self.pca = _randomized_pca(n_components)
+            else:
+                self.pca = PCA(n_components=n_components)
+            self.pca.fit(X)
+        else:
+            self.pca = None
+            if min(X.shape) > _PCA_AUTO_MAX_COMPONENTS:
+                self.pca = _randomized_pca(_PCA_AUTO_MAX_COMPONENTS).fit(X)
+                if self.pca.explained_variance_ratio_.sum() < variance_threshold:
+                    self.pca = None
+            if self.pca is None:
+                self.pca = PCA(svd_solver='full').fit(X)
         
         if n_components is None:
             # Determine optimal number of components
-            pca_temp = PCA()
-            pca_temp.fit(X)
-            cumsum = np.cumsum(pca_temp.explained_variance_ratio_)
-            n_components = np.argmax(cumsum >= variance_threshold) + 1
+            cumsum = np.cumsum(self.pca.explained_variance_ratio_)
+            if cumsum[-1] >= variance_threshold:
+                n_components = int(np.argmax(cumsum >= variance_threshold) + 1)
+            else:
+                n_components = len(cumsum)
+            _truncate_pca(self.pca, n_components)
             print(f"Auto-selected {n_components} components for {variance_threshold*100}% variance")
         
-        # Apply PCA
-        self.pca = PCA(n_components=n_components)
-        X_pca = self.pca.fit_transform(X)
+        X_pca = self.pca.transform(X)
         
         # Create DataFrame
         pca_cols = [f'PC{i+1}' for i in range(n_components)]
@@ -415,6 +709,16 @@ class DataPreprocessor:
         
         return df_pca, self.pca.explained_variance_ratio_
     
+    @staticmethod
+    def _sparse_matrix(df, columns, sparse_cols, dtype=np.float64):
+        """CSR matrix of df[columns], built without densifying sparse_cols."""
+        dense_cols = [col for col in columns if col not in set(sparse_cols)]
+        X = sparse.hstack([sparse.csr_matrix(df[dense_cols].to_numpy(dtype=dtype)),
+                           df[sparse_cols].sparse.to_coo()], format='csr', dtype=dtype)
+        # Restore the original column order
+        position = {col: i for i, col in enumerate(dense_cols + sparse_cols)}
+        return X[:, [position[col] for col in columns]]
+    
     def get_preprocessing_pipeline(self, df, 
                                      handle_missing=True,
                                      handle_outliers=True,
@@ -423,7 +727,11 @@ class DataPreprocessor:
                                      scale_features=True,
                                      apply_pca=False,
                                      scaling_method='standard',
-                                     pca_components=None):
+                                     pca_components=None,
+                                     pca_batch_size=None,
+                                     sparse_onehot=False,
+                                     dtype=None,
+                                     verbose=False):
         """
         Complete preprocessing pipeline.
         
@@ -447,6 +755,16 @@ class DataPreprocessor:
             Scaling method to use
         pca_components : int
             Number of PCA components
+        pca_batch_size : int
+            Mini-batch size for IncrementalPCA (None = full PCA)
+        sparse_onehot : bool
+            Whether to keep one-hot columns sparse (see encode_categorical)
+        dtype : numpy dtype
+            Dtype for scaled features and PCA, e.g. np.float32 to halve memory
+            traffic (None = float64)
+        verbose : bool
+            Whether to print full-frame diagnostics (remaining missing values,
+            final feature list)
             
         Returns:
         --------
@@ -457,57 +775,73 @@ class DataPreprocessor:
         print("STARTING PREPROCESSING PIPELINE")
         print("="*80)
         
+        # The pipeline works on a single copy of df, which every stage below
+        # then modifies in place
         df_processed = df.copy()
-        
-        # Store ID column if exists
-        id_col = None
-        for col in df_processed.columns:
-            if 'ID' in col.upper():
-                id_col = col
-                break
-        
-        # Step 1: Handle missing values
-        if handle_missing:
-            df_processed = self.handle_missing_values(df_processed)
-        
-        # Step 2: Handle outliers
-        if handle_outliers:
-            outlier_info = self.detect_outliers(df_processed)
-            print(f"\nDetected outliers in {len(outlier_info)} features")
-            df_processed = self.handle_outliers(df_processed, method='cap', outlier_info=outlier_info)
-        
-        # Step 3: Feature engineering
-        if engineer_features:
-            df_processed = self.feature_engineering(df_processed)
-        
-        # Step 4: Encode categorical
-        if encode_categorical:
-            exclude = [id_col] if id_col else []
-            df_processed = self.encode_categorical(df_processed, encoding_method='onehot', 
-                                                     exclude_columns=exclude)
-        
-        # Step 5: Scale features
-        if scale_features:
-            exclude = [id_col] if id_col else []
-            df_processed = self.scale_features(df_processed, method=scaling_method, 
-                                                exclude_columns=exclude)
-        
-        # Step 6: Apply PCA
-        if apply_pca:
-            exclude = [id_col] if id_col else []
-            df_processed, var_ratios = self.apply_pca(df_processed, n_components=pca_components,
-                                                        exclude_columns=exclude)
+        try:
+            self._refresh_column_cache(df_processed)
+            
+            # Detect ID columns once; engineered and encoded columns added later
+            # are never IDs, even if their names happen to contain 'id'
+            self._id_cols = {col for col in df_processed.columns if 'id' in col.lower()}
+            id_cols = [col for col in df_processed.columns if col in self._id_cols]
+            
+            # Step 1: Handle missing values
+            if handle_missing:
+                df_processed = self.handle_missing_values(df_processed, inplace=True, verbose=verbose)
+                self._refresh_column_cache(df_processed)
+            
+            # Step 2: Handle outliers
+            if handle_outliers:
+                outlier_info = self.detect_outliers(df_processed)
+                print(f"\nDetected outliers in {len(outlier_info)} features")
+                df_processed = self.handle_outliers(df_processed, method='cap', outlier_info=outlier_info,
+                                                    inplace=True)
+            
+            # Step 3: Feature engineering
+            if engineer_features:
+                df_processed = self.feature_engineering(df_processed, inplace=True)
+                self._refresh_column_cache(df_processed)
+            
+            # Step 4: Encode categorical
+            if encode_categorical:
+                exclude = id_cols
+                df_processed = self.encode_categorical(df_processed, encoding_method='onehot', 
+                                                         exclude_columns=exclude, inplace=True,
+                                                         sparse=sparse_onehot)
+                self._refresh_column_cache(df_processed)
+            
+            # Step 5: Scale features; the scaled block is passed on to PCA so it
+            # is not extracted from the frame a second time
+            scaled = None
+            if scale_features:
+                exclude = id_cols
+                df_processed, X_scaled, scaled_cols = self._scale(df_processed, scaling_method, exclude,
+                                                                  inplace=True, dtype=dtype)
+                scaled = (X_scaled, scaled_cols)
+            
+            # Step 6: Apply PCA
+            if apply_pca:
+                exclude = id_cols
+                df_processed, var_ratios = self._apply_pca(df_processed, pca_components, 0.90, exclude,
+                                                           pca_batch_size, dtype, scaled=scaled)
+        finally:
+            # Reset even if a stage raised, so the stale frame and ID set do not
+            # leak into later standalone calls (and the frame is not kept alive)
+            self._cached_frame = None
+            self._id_cols = None
         
         print("\n" + "="*80)
         print("PREPROCESSING COMPLETE")
         print("="*80)
         print(f"Final shape: {df_processed.shape}")
-        print(f"Final features: {df_processed.columns.tolist()}")
+        if verbose:
+            print(f"Final features: {df_processed.columns.tolist()}")
         
         return df_processed
     
     def save_preprocessor(self, filepath='models/preprocessor.pkl'):
-        """Save preprocessing objects."""
+        """Save preprocessing objects (uncompressed, so loaders can memory-map them)."""
         preprocessing_objects = {
             'scaler': self.scaler,
             'pca': self.pca,
@@ -515,7 +849,7 @@ class DataPreprocessor:
             'imputers': self.imputers,
             'feature_names': self.feature_names
         }
-        joblib.dump(preprocessing_objects, filepath)
+        joblib.dump(preprocessing_objects, filepath, protocol=5)
         print(f"Saved preprocessor to {filepath}")
     
     def load_preprocessor(self, filepath='models/preprocessor.pkl'):
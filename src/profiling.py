@@ -6,8 +6,41 @@ Analyzes and creates detailed profiles for each customer segment.
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
 from scipy import stats
+from numba import njit, prange
+
+
+# Explicit signatures so the kernel compiles eagerly at import (and is then
+# loaded from the on-disk cache) instead of on the first profiling call
+@njit(['float64[:, :](float64[:, :], int64[:], int64)',
+       'float64[:, :](float32[:, :], int64[:], int64)'], parallel=True, cache=True)
+def _numba_group_means(values, codes, n_groups):
+    """
+    Per-group column means of values, skipping NaN like pandas.
+    
+    float32 input is read as-is but accumulated in float64.
+    
+    Columns are processed in parallel (each thread owns its column's
+    accumulators, so there are no write races); values should be
+    Fortran-ordered so each column is one contiguous sweep.
+    """
+    n, d = values.shape
+    means = np.empty((n_groups, d))
+    for j in prange(d):
+        sums = np.zeros(n_groups)
+        counts = np.zeros(n_groups, dtype=np.int64)
+        for i in range(n):
+            v = values[i, j]
+            if not np.isnan(v):
+                sums[codes[i]] += v
+                counts[codes[i]] += 1
+        for g in range(n_groups):
+            means[g, j] = sums[g] / counts[g] if counts[g] > 0 else np.nan
+    return means
+
+
+# Columns whose per-cluster averages are reported as headline profile fields
+_PROFILE_COLUMNS = ['Age', 'Income', 'Recency', 'Frequency', 'Monetary', 'WebsiteVisits', 'EmailOpenRate']
 
 
 class ClusterProfiler:
@@ -17,8 +50,12 @@ class ClusterProfiler:
         """Initialize profiler."""
         self.profiles = {}
         self.segment_names = {}
+        # Cluster grouping from the last create_cluster_profiles call (a copy
+        # of its labels, each row's cluster position and the cluster ids),
+        # reused by plot_cluster_heatmap while the labels are unchanged
+        self._cache = {}
     
-    def create_cluster_profiles(self, df, labels, label_column='Cluster'):
+    def create_cluster_profiles(self, df, labels, label_column='Cluster', use_numba=False, dtype=None):
         """
         Create detailed profiles for each cluster.
         
@@ -30,57 +67,109 @@ class ClusterProfiler:
             Cluster labels
         label_column : str
             Name for cluster label column
+        use_numba : bool
+            Compute the numeric means with a compiled single-pass kernel
+            instead of pandas groupby (faster on wide frames)
+        dtype : numpy dtype, optional
+            Aggregate the numeric columns in this dtype (e.g. np.float32 to
+            halve memory traffic); the resulting means are float64
             
         Returns:
         --------
         dict
             Profiles for each cluster
         """
-        df_copy = df.copy()
-        df_copy[label_column] = labels
+        # Labels are kept as a Series aligned with df instead of being added
+        # to a full copy of the frame
+        cluster_labels = pd.Series(labels, index=df.index, name=label_column)
         
         print("="*80)
         print("CLUSTER PROFILING")
         print("="*80)
         
+        # One groupby gives every cluster's size and means, instead of
+        # masking the frame per cluster
+        numeric_cols = df.select_dtypes(include=[np.number]).columns
+        numeric_cols = [c for c in numeric_cols if c != label_column]
+        block = df[numeric_cols] if dtype is None else df[numeric_cols].astype(dtype)
+        
+        if use_numba:
+            codes, cluster_ids = pd.factorize(cluster_labels, sort=True)
+            cluster_ids = cluster_ids.rename(label_column)
+            values = block.to_numpy(dtype=dtype or np.float64, na_value=np.nan)
+            valid = codes >= 0
+            if not valid.all():
+                # Rows with missing labels belong to no cluster, as in groupby
+                values, codes = values[valid], codes[valid]
+            means = pd.DataFrame(_numba_group_means(np.asfortranarray(values), codes, len(cluster_ids)),
+                                 index=cluster_ids, columns=numeric_cols)
+            sizes = pd.Series(np.bincount(codes, minlength=len(cluster_ids)), index=cluster_ids)
+        else:
+            grouped = block.groupby(cluster_labels, sort=True)
+            sizes = grouped.size()
+            means = grouped.mean().astype(np.float64)
+        # Position of each row's cluster in sizes.index (-1 = missing label)
+        cluster_codes = sizes.index.get_indexer(cluster_labels)
+        self._cache = {'labels': cluster_labels.copy(), 'codes': cluster_codes, 'cluster_ids': sizes.index}
+        
+        if 'Gender' in df.columns:
+            # (cluster, gender) count table from one integer bincount
+            gender_codes, genders = pd.factorize(df['Gender'], sort=True)
+            valid = (gender_codes >= 0) & (cluster_codes >= 0)
+            gender_hist = np.bincount(cluster_codes[valid] * len(genders) + gender_codes[valid],
+                                      minlength=len(sizes) * len(genders)).reshape(len(sizes), len(genders))
+            gender_hist = pd.DataFrame(gender_hist, index=sizes.index, columns=genders)
+        
+        # Noise points (-1) count towards percentages but get no profile
+        sizes = sizes.drop(-1, errors='ignore')
+        percentages = sizes / len(df) * 100
+        
+        # Headline averages for all clusters as one row-per-cluster lookup
+        # table, rather than indexing a means Series column by column
+        wanted = [c for c in _PROFILE_COLUMNS if c in means.columns]
+        summary = means[wanted].to_dict('index')
+        # Full numeric means as plain rows, one tolist() per cluster
+        mean_columns = tuple(means.columns)
+        mean_rows = means.to_numpy()[means.index.get_indexer(sizes.index)]
+        
         profiles = {}
-        unique_labels = sorted([l for l in df_copy[label_column].unique() if l != -1])
         
-        for cluster_id in unique_labels:
-            cluster_data = df_copy[df_copy[label_column] == cluster_id]
+        for cluster_id, size, percentage, mean_row in zip(sizes.index, sizes.tolist(), percentages.tolist(),
+                                                          mean_rows):
+            row = summary[cluster_id]
             
             profile = {
                 'cluster_id': cluster_id,
-                'size': len(cluster_data),
-                'percentage': len(cluster_data) / len(df_copy) * 100
+                'size': size,
+                'percentage': percentage
             }
             
             # Demographic profile
-            if 'Age' in cluster_data.columns:
-                profile['avg_age'] = cluster_data['Age'].mean()
-            if 'Income' in cluster_data.columns:
-                profile['avg_income'] = cluster_data['Income'].mean()
-            if 'Gender' in cluster_data.columns:
-                profile['gender_dist'] = cluster_data['Gender'].value_counts().to_dict()
+            if 'Age' in row:
+                profile['avg_age'] = row['Age']
+            if 'Income' in row:
+                profile['avg_income'] = row['Income']
+            if 'Gender' in df.columns:
+                counts = gender_hist.loc[cluster_id]
+                order = np.argsort(-counts.to_numpy(), kind='stable')
+                profile['gender_dist'] = {genders[k]: int(counts.iat[k]) for k in order if counts.iat[k] > 0}
             
             # Behavioral profile (RFM)
-            if 'Recency' in cluster_data.columns:
-                profile['avg_recency'] = cluster_data['Recency'].mean()
-            if 'Frequency' in cluster_data.columns:
-                profile['avg_frequency'] = cluster_data['Frequency'].mean()
-            if 'Monetary' in cluster_data.columns:
-                profile['avg_monetary'] = cluster_data['Monetary'].mean()
+            if 'Recency' in row:
+                profile['avg_recency'] = row['Recency']
+            if 'Frequency' in row:
+                profile['avg_frequency'] = row['Frequency']
+            if 'Monetary' in row:
+                profile['avg_monetary'] = row['Monetary']
             
             # Engagement profile
-            if 'WebsiteVisits' in cluster_data.columns:
-                profile['avg_website_visits'] = cluster_data['WebsiteVisits'].mean()
-            if 'EmailOpenRate' in cluster_data.columns:
-                profile['avg_email_open_rate'] = cluster_data['EmailOpenRate'].mean()
+            if 'WebsiteVisits' in row:
+                profile['avg_website_visits'] = row['WebsiteVisits']
+            if 'EmailOpenRate' in row:
+                profile['avg_email_open_rate'] = row['EmailOpenRate']
             
             # Store all numeric means
-            numeric_cols = cluster_data.select_dtypes(include=[np.number]).columns
-            numeric_cols = [c for c in numeric_cols if c != label_column]
-            profile['numeric_means'] = cluster_data[numeric_cols].mean().to_dict()
+            profile['numeric_means'] = dict(zip(mean_columns, mean_row.tolist()))
             
             profiles[cluster_id] = profile
             
@@ -119,28 +208,31 @@ class ClusterProfiler:
                                       key=lambda x: x[1].get('avg_monetary', 0), 
                                       reverse=True)
             
-            for idx, (cluster_id, profile) in enumerate(sorted_clusters):
-                recency = profile.get('avg_recency', 0)
-                frequency = profile.get('avg_frequency', 0)
-                monetary = profile.get('avg_monetary', 0)
-                
-                # High value segments
-                if monetary > 5000 and frequency > 15:
-                    name = "VIP Champions"
-                elif monetary > 3000 and recency < 30:
-                    name = "High-Value Loyalists"
-                elif monetary > 2000 and frequency > 8:
-                    name = "Loyal Customers"
-                elif monetary > 1000 and recency < 60:
-                    name = "Potential Loyalists"
-                elif frequency < 5:
-                    name = "Occasional Shoppers"
-                elif recency > 90:
-                    name = "At-Risk/Dormant"
-                else:
-                    name = f"Segment {cluster_id}"
-                
-                segment_names[cluster_id] = name
+            cluster_ids = [cluster_id for cluster_id, _ in sorted_clusters]
+            # Decision table evaluated for all clusters at once; np.select
+            # picks the first matching rule, like the if/elif chain did
+            recency, frequency, monetary = np.array(
+                [[p.get('avg_recency', 0), p.get('avg_frequency', 0), p.get('avg_monetary', 0)]
+                 for _, p in sorted_clusters], dtype=np.float64).reshape(-1, 3).T
+            conditions = [
+                (monetary > 5000) & (frequency > 15),
+                (monetary > 3000) & (recency < 30),
+                (monetary > 2000) & (frequency > 8),
+                (monetary > 1000) & (recency < 60),
+                frequency < 5,
+                recency > 90,
+            ]
+            choices = [
+                "VIP Champions",
+                "High-Value Loyalists",
+                "Loyal Customers",
+                "Potential Loyalists",
+                "Occasional Shoppers",
+                "At-Risk/Dormant",
+            ]
+            default = np.array([f"Segment {cluster_id}" for cluster_id in cluster_ids], dtype=object)
+            names = np.select(conditions, choices, default=default)
+            segment_names = dict(zip(cluster_ids, names.tolist()))
         else:
             # Default naming
             for cluster_id in profiles.keys():
@@ -149,7 +241,7 @@ class ClusterProfiler:
         self.segment_names = segment_names
         return segment_names
     
-    def plot_cluster_heatmap(self, df, labels, features=None, save_path=None):
+    def plot_cluster_heatmap(self, df, labels, features=None, save_path=None, show=True, dtype=None):
         """
         Create heatmap showing average feature values per cluster.
         
@@ -163,32 +255,67 @@ class ClusterProfiler:
             Features to include (None = all numeric)
         save_path : str
             Path to save figure
+        show : bool
+            Display the figure; with show=False it is only saved (if
+            save_path is given) and then closed
+        dtype : numpy dtype, optional
+            Aggregate and normalize in this dtype (e.g. np.float32)
         """
-        df_copy = df.copy()
-        df_copy['Cluster'] = labels
+        import seaborn as sns
+        
+        cluster_labels = pd.Series(labels, index=df.index, name='Cluster')
         
         if features is None:
-            features = df_copy.select_dtypes(include=[np.number]).columns.tolist()
+            features = df.select_dtypes(include=[np.number]).columns.tolist()
             features = [f for f in features if f != 'Cluster']
         
-        # Calculate means per cluster
-        cluster_means = df_copy.groupby('Cluster')[features].mean()
+        # Means are always computed from df as given; only the grouping is
+        # reused, and only if the labels still equal the profiled ones
+        cache = self._cache
+        if (cache and cache['labels'].equals(cluster_labels)
+                and (dtype is None or np.dtype(dtype) in (np.float32, np.float64))):
+            codes, cluster_ids = cache['codes'], cache['cluster_ids']
+            values = df[features].to_numpy(dtype=dtype or np.float64, na_value=np.nan)
+            valid = codes >= 0
+            if not valid.all():
+                # Rows with missing labels belong to no cluster, as in groupby
+                values, codes = values[valid], codes[valid]
+            cluster_means = pd.DataFrame(
+                _numba_group_means(np.asfortranarray(values), codes, len(cluster_ids)),
+                index=cluster_ids.rename('Cluster'), columns=features)
+        else:
+            # Calculate means per cluster
+            block = df[features] if dtype is None else df[features].astype(dtype)
+            cluster_means = block.groupby(cluster_labels).mean()
         
-        # Normalize for better visualization
-        cluster_means_norm = (cluster_means - cluster_means.min()) / (cluster_means.max() - cluster_means.min())
+        # Min-max normalize each feature for better visualization; constant
+        # features map to 0 instead of dividing by zero
+        M = cluster_means.to_numpy(dtype=dtype or np.float64, copy=True)
+        lo = np.nanmin(M, axis=0, keepdims=True)
+        span = np.nanmax(M, axis=0, keepdims=True) - lo
+        M -= lo
+        M /= np.where(span == 0, 1, span)
+        cluster_means_norm = pd.DataFrame(M, index=cluster_means.index, columns=cluster_means.columns)
         
-        plt.figure(figsize=(12, 8))
-        sns.heatmap(cluster_means_norm.T, annot=True, fmt='.2f', cmap='RdYlGn', 
+        # Cell labels formatted in one vectorized pass instead of per cell
+        # inside seaborn
+        annot = np.char.mod('%.2f', M.T)
+        
+        fig = plt.figure(figsize=(12, 8))
+        sns.heatmap(cluster_means_norm.T, annot=annot, fmt='', cmap='RdYlGn', 
                      cbar_kws={'label': 'Normalized Value'})
         plt.xlabel('Cluster', fontsize=12)
         plt.ylabel('Features', fontsize=12)
         plt.title('Cluster Feature Heatmap', fontsize=14, fontweight='bold')
         
         if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
+            fig.savefig(save_path, dpi=300, bbox_inches='tight')
         
         plt.tight_layout()
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close(fig)
     
     def generate_marketing_strategies(self, profiles, segment_names):
         """
@@ -277,41 +404,46 @@ class ClusterProfiler:
     
     def print_segment_report(self, profiles, segment_names, strategies):
         """Print comprehensive segment report."""
-        print("\n" + "="*80)
-        print("CUSTOMER SEGMENTATION REPORT")
-        print("="*80)
+        # Build the report as a list of lines and write it with one print,
+        # instead of flushing a print per line
+        lines = []
+        lines.append("\n" + "="*80)
+        lines.append("CUSTOMER SEGMENTATION REPORT")
+        lines.append("="*80)
         
         for cluster_id, profile in profiles.items():
             name = segment_names.get(cluster_id, f"Segment {cluster_id}")
             strategy = strategies.get(cluster_id, {})
             
-            print(f"\n{'='*80}")
-            print(f"SEGMENT: {name}")
-            print(f"{'='*80}")
-            print(f"Cluster ID: {cluster_id}")
-            print(f"Size: {profile['size']} customers ({profile['percentage']:.1f}%)")
+            lines.append(f"\n{'='*80}")
+            lines.append(f"SEGMENT: {name}")
+            lines.append(f"{'='*80}")
+            lines.append(f"Cluster ID: {cluster_id}")
+            lines.append(f"Size: {profile['size']} customers ({profile['percentage']:.1f}%)")
             
-            print(f"\nKey Characteristics:")
+            lines.append(f"\nKey Characteristics:")
             if 'avg_recency' in profile:
-                print(f"  • Average Days Since Last Purchase: {profile['avg_recency']:.1f}")
+                lines.append(f"  • Average Days Since Last Purchase: {profile['avg_recency']:.1f}")
             if 'avg_frequency' in profile:
-                print(f"  • Average Purchase Frequency: {profile['avg_frequency']:.1f}")
+                lines.append(f"  • Average Purchase Frequency: {profile['avg_frequency']:.1f}")
             if 'avg_monetary' in profile:
-                print(f"  • Average Total Spending: ${profile['avg_monetary']:.2f}")
+                lines.append(f"  • Average Total Spending: ${profile['avg_monetary']:.2f}")
             if 'avg_age' in profile:
-                print(f"  • Average Age: {profile['avg_age']:.1f}")
+                lines.append(f"  • Average Age: {profile['avg_age']:.1f}")
             if 'avg_income' in profile:
-                print(f"  • Average Income: ${profile['avg_income']:.2f}")
+                lines.append(f"  • Average Income: ${profile['avg_income']:.2f}")
             
             if strategy:
-                print(f"\nMarketing Strategy: {strategy.get('strategy', 'N/A')}")
-                print(f"Communication Channel: {strategy.get('channel', 'N/A')}")
-                print(f"Offer Type: {strategy.get('offer_type', 'N/A')}")
-                print(f"\nRecommended Tactics:")
+                lines.append(f"\nMarketing Strategy: {strategy.get('strategy', 'N/A')}")
+                lines.append(f"Communication Channel: {strategy.get('channel', 'N/A')}")
+                lines.append(f"Offer Type: {strategy.get('offer_type', 'N/A')}")
+                lines.append(f"\nRecommended Tactics:")
                 for i, tactic in enumerate(strategy.get('tactics', []), 1):
-                    print(f"  {i}. {tactic}")
+                    lines.append(f"  {i}. {tactic}")
+        
+        lines.append("\n" + "="*80)
         
-        print("\n" + "="*80)
+        print("\n".join(lines))
 
 
 # Example usage
@@ -7,9 +7,6 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -17,6 +14,65 @@ warnings.filterwarnings('ignore')
 sns.set_style("whitegrid")
 plt.rcParams['figure.figsize'] = (12, 6)
 
+# Scatter plots draw at most this many points by default
+_MAX_SCATTER_POINTS = 10_000
+
+
+def _stratified_sample(labels, max_points, seed=0):
+    """
+    Sorted row indices of a subsample of at most ~max_points rows.
+    
+    Each cluster keeps the same share of points it has in the full data
+    (at least one), so cluster densities look the same. Returns None when
+    no subsampling is needed.
+    """
+    labels = np.asarray(labels)
+    n = len(labels)
+    if max_points is None or n <= max_points:
+        return None
+    
+    rng = np.random.default_rng(seed)
+    order = np.argsort(labels, kind='stable')
+    _, starts = np.unique(labels[order], return_index=True)
+    picked = []
+    for idx_c in np.split(order, starts[1:]):
+        budget_c = max(1, round(len(idx_c) * max_points / n))
+        picked.append(rng.choice(idx_c, size=min(len(idx_c), budget_c), replace=False))
+    return np.sort(np.concatenate(picked))
+
+
+def _grouped_box_stats(df, columns, by):
+    """
+    Matplotlib bxp() stats for each column of df, one box per group of the
+    label Series by (aligned with df's index).
+    
+    Quartiles for all columns come from a single grouped quantile pass;
+    whiskers (furthest points within 1.5 IQR) and fliers then follow from
+    one masked reduction per column, matching Axes.boxplot.
+    """
+    groups = by
+    quartiles = df.groupby(by)[columns].quantile([0.25, 0.5, 0.75]).unstack(level=-1)
+    stats = {}
+    
+    for col in columns:
+        q1, med, q3 = (quartiles[(col, q)] for q in (0.25, 0.5, 0.75))
+        iqr = q3 - q1
+        lo = (q1 - 1.5 * iqr).reindex(groups).to_numpy()
+        hi = (q3 + 1.5 * iqr).reindex(groups).to_numpy()
+        
+        values = df[col]
+        inside = (values >= lo) & (values <= hi)
+        whislo = values.where(inside).groupby(groups).min().fillna(q1)
+        whishi = values.where(inside).groupby(groups).max().fillna(q3)
+        outside = values.notna() & ~inside
+        fliers = {g: v.to_numpy() for g, v in values[outside].groupby(groups[outside])}
+        
+        stats[col] = [{'label': g, 'q1': q1[g], 'med': med[g], 'q3': q3[g],
+                       'whislo': whislo[g], 'whishi': whishi[g],
+                       'fliers': fliers.get(g, np.empty(0))}
+                      for g in quartiles.index]
+    return stats
+
 
 class SegmentationVisualizer:
     """Create visualizations for customer segmentation."""
@@ -25,7 +81,8 @@ class SegmentationVisualizer:
         """Initialize visualizer."""
         self.figures = []
     
-    def plot_cluster_scatter_2d(self, X, labels, feature_names=None, title='Cluster Visualization', save_path=None):
+    def plot_cluster_scatter_2d(self, X, labels, feature_names=None, title='Cluster Visualization', save_path=None,
+                                max_points=_MAX_SCATTER_POINTS, show=True):
         """
         2D scatter plot of clusters using first 2 features/components.
         
@@ -41,13 +98,25 @@ class SegmentationVisualizer:
             Plot title
         save_path : str
             Path to save figure
+        max_points : int
+            Plot a stratified subsample of at most this many points
+            (None = all points)
+        show : bool
+            Display the figure; with show=False it is only saved (if
+            save_path is given) and then closed
         """
         if feature_names is None:
             feature_names = [f'Feature {i+1}' for i in range(X.shape[1])]
         
-        plt.figure(figsize=(10, 8))
+        X, labels = np.asarray(X), np.asarray(labels)
+        sample = _stratified_sample(labels, max_points)
+        if sample is not None:
+            X, labels = X[sample], labels[sample]
+        
+        fig = plt.figure(figsize=(10, 8))
         scatter = plt.scatter(X[:, 0], X[:, 1], c=labels, cmap='viridis', 
-                               alpha=0.6, edgecolors='w', linewidth=0.5, s=50)
+                               alpha=0.6, edgecolors='w', linewidth=0.5, s=50,
+                               rasterized=True)
         plt.colorbar(scatter, label='Cluster')
         plt.xlabel(feature_names[0], fontsize=12)
         plt.ylabel(feature_names[1], fontsize=12)
@@ -55,12 +124,16 @@ class SegmentationVisualizer:
         plt.grid(True, alpha=0.3)
         
         if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
+            fig.savefig(save_path, dpi=300, bbox_inches='tight')
         
         plt.tight_layout()
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close(fig)
     
-    def plot_cluster_scatter_3d(self, X, labels, feature_names=None, title='3D Cluster Visualization'):
+    def plot_cluster_scatter_3d(self, X, labels, feature_names=None, title='3D Cluster Visualization',
+                                max_points=_MAX_SCATTER_POINTS):
         """
         Interactive 3D scatter plot using Plotly.
         
@@ -74,24 +147,37 @@ class SegmentationVisualizer:
             Names of features
         title : str
             Plot title
+        max_points : int
+            Plot a stratified subsample of at most this many points
+            (None = all points)
         """
+        import plotly.graph_objects as go
+        
         if feature_names is None:
             feature_names = [f'Feature {i+1}' for i in range(min(3, X.shape[1]))]
         
-        df = pd.DataFrame({
-            feature_names[0]: X[:, 0],
-            feature_names[1]: X[:, 1],
-            feature_names[2]: X[:, 2] if X.shape[1] > 2 else np.zeros(len(X)),
-            'Cluster': labels
-        })
+        X, labels = np.asarray(X), np.asarray(labels)
+        sample = _stratified_sample(labels, max_points)
+        if sample is not None:
+            X, labels = X[sample], labels[sample]
         
-        fig = px.scatter_3d(df, x=feature_names[0], y=feature_names[1], z=feature_names[2],
-                             color='Cluster', title=title,
-                             color_continuous_scale='viridis')
+        z = X[:, 2] if X.shape[1] > 2 else np.zeros(len(X), dtype=X.dtype)
+        z_title = feature_names[2] if len(feature_names) > 2 else ''
+        
+        # Arrays go straight to the trace; no intermediate DataFrame
+        fig = go.Figure(data=go.Scatter3d(
+            x=X[:, 0], y=X[:, 1], z=z, mode='markers',
+            marker=dict(color=labels, colorscale='Viridis',
+                        colorbar=dict(title='Cluster'))
+        ))
+        fig.update_layout(title=title,
+                          scene=dict(xaxis_title=feature_names[0],
+                                     yaxis_title=feature_names[1],
+                                     zaxis_title=z_title))
         fig.update_layout(height=700)
         fig.show()
     
-    def plot_rfm_analysis(self, df, labels, save_path=None):
+    def plot_rfm_analysis(self, df, labels, save_path=None, show=True):
         """
         RFM analysis visualization.
         
@@ -103,26 +189,29 @@ class SegmentationVisualizer:
             Cluster labels
         save_path : str
             Path to save figure
+        show : bool
+            Display the figure; with show=False it is only saved (if
+            save_path is given) and then closed
         """
-        df_copy = df.copy()
-        df_copy['Cluster'] = labels
+        cluster_labels = pd.Series(labels, index=df.index, name='Cluster')
         
         fig, axes = plt.subplots(1, 3, figsize=(18, 5))
+        box_stats = _grouped_box_stats(df, ['Recency', 'Frequency', 'Monetary'], cluster_labels)
         
         # Recency by cluster
-        df_copy.boxplot(column='Recency', by='Cluster', ax=axes[0])
+        axes[0].bxp(box_stats['Recency'])
         axes[0].set_title('Recency by Cluster', fontweight='bold')
         axes[0].set_xlabel('Cluster')
         axes[0].set_ylabel('Days Since Last Purchase')
         
         # Frequency by cluster
-        df_copy.boxplot(column='Frequency', by='Cluster', ax=axes[1])
+        axes[1].bxp(box_stats['Frequency'])
         axes[1].set_title('Frequency by Cluster', fontweight='bold')
         axes[1].set_xlabel('Cluster')
         axes[1].set_ylabel('Number of Purchases')
         
         # Monetary by cluster
-        df_copy.boxplot(column='Monetary', by='Cluster', ax=axes[2])
+        axes[2].bxp(box_stats['Monetary'])
         axes[2].set_title('Monetary by Cluster', fontweight='bold')
         axes[2].set_xlabel('Cluster')
         axes[2].set_ylabel('Total Spending ($)')
@@ -130,12 +219,15 @@ class SegmentationVisualizer:
         plt.suptitle('RFM Analysis by Cluster', fontsize=16, fontweight='bold', y=1.02)
         
         if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
+            fig.savefig(save_path, dpi=300, bbox_inches='tight')
         
         plt.tight_layout()
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close(fig)
     
-    def create_interactive_dashboard(self, df, labels, segment_names=None):
+    def create_interactive_dashboard(self, df, labels, segment_names=None, max_points=_MAX_SCATTER_POINTS):
         """
         Create interactive dashboard using Plotly.
         
@@ -147,19 +239,27 @@ class SegmentationVisualizer:
             Cluster labels
         segment_names : dict
             Mapping of cluster IDs to names
+        max_points : int
+            Cap on points in the value scatter, subsampled per cluster
+            (None = all points)
             
         Returns:
         --------
         plotly.graph_objects.Figure
             Interactive dashboard
         """
-        df_copy = df.copy()
-        df_copy['Cluster'] = labels
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
         
+        # Labels live in their own Series next to df rather than in a copy
+        cluster_labels = pd.Series(labels, index=df.index, name='Cluster')
+        
+        # Categorical segments: every per-segment step below works on codes
         if segment_names:
-            df_copy['Segment'] = df_copy['Cluster'].map(segment_names)
+            segments = pd.Categorical(cluster_labels.map(segment_names))
         else:
-            df_copy['Segment'] = 'Cluster ' + df_copy['Cluster'].astype(str)
+            segments = pd.Categorical('Cluster ' + cluster_labels.astype(str))
+        segments = pd.Series(segments, index=df.index, name='Segment')
         
         # Create subplots
         fig = make_subplots(
@@ -171,7 +271,7 @@ class SegmentationVisualizer:
         )
         
         # 1. Segment distribution pie chart
-        segment_counts = df_copy['Segment'].value_counts()
+        segment_counts = segments.value_counts()
         fig.add_trace(
             go.Pie(labels=segment_counts.index, values=segment_counts.values, 
                     name='Segments'),
@@ -179,8 +279,8 @@ class SegmentationVisualizer:
         )
         
         # 2. Average RFM by segment
-        if all(col in df_copy.columns for col in ['Recency', 'Frequency', 'Monetary']):
-            rfm_avg = df_copy.groupby('Segment')[['Recency', 'Frequency', 'Monetary']].mean()
+        if all(col in df.columns for col in ['Recency', 'Frequency', 'Monetary']):
+            rfm_avg = df[['Recency', 'Frequency', 'Monetary']].groupby(segments, observed=True).mean()
             
             for col in ['Recency', 'Frequency', 'Monetary']:
                 fig.add_trace(
@@ -189,9 +289,12 @@ class SegmentationVisualizer:
                 )
         
         # 3. Scatter: Frequency vs Monetary
-        if 'Frequency' in df_copy.columns and 'Monetary' in df_copy.columns:
-            for segment in df_copy['Segment'].unique():
-                segment_data = df_copy[df_copy['Segment'] == segment]
+        if 'Frequency' in df.columns and 'Monetary' in df.columns:
+            sample = _stratified_sample(labels, max_points)
+            scatter_df, scatter_segments = df[['Frequency', 'Monetary']], segments
+            if sample is not None:
+                scatter_df, scatter_segments = scatter_df.iloc[sample], segments.iloc[sample]
+            for segment, segment_data in scatter_df.groupby(scatter_segments, sort=False, observed=True):
                 fig.add_trace(
                     go.Scatter(x=segment_data['Frequency'], y=segment_data['Monetary'],
                                 mode='markers', name=segment, opacity=0.6),
@@ -211,7 +314,7 @@ class SegmentationVisualizer:
         
         return fig
     
-    def plot_pca_variance(self, explained_variance_ratio, save_path=None):
+    def plot_pca_variance(self, explained_variance_ratio, save_path=None, show=True):
         """
         Plot PCA explained variance.
         
@@ -221,6 +324,9 @@ class SegmentationVisualizer:
             Explained variance ratios from PCA
         save_path : str
             Path to save figure
+        show : bool
+            Display the figure; with show=False it is only saved (if
+            save_path is given) and then closed
         """
         cumsum = np.cumsum(explained_variance_ratio)
         
@@ -246,10 +352,13 @@ class SegmentationVisualizer:
         plt.suptitle('PCA Analysis', fontsize=14, fontweight='bold', y=1.02)
         
         if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
+            fig.savefig(save_path, dpi=300, bbox_inches='tight')
         
         plt.tight_layout()
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close(fig)
 
 
 # Example usage